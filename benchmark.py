@@ -0,0 +1,319 @@
+"""Benchmarks label generation and the catalog lookups on synthetic data.
+
+    python benchmark.py                          # full run, results in output/benchmark.json
+    python benchmark.py --sizes 10,100 --repeat 3
+    python benchmark.py --baseline old.json      # exit 1 if anything got >20% worse
+    python benchmark.py --startup-only           # exit 1 if the app starts slower than its budget
+
+Every generate_pdf case runs in a fresh process with its own working
+directory (so the logo cache starts cold and peak RSS is per case), against
+a synthetic catalog with REC or MED tiers, with or without tier logos.
+Startup is timed in fresh interpreters too: importing the UI, and opening
+the first window when there is a display. The memory a large queue holds
+is measured with tracemalloc.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import multiprocessing
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+SIZES = [10, 100, 1000, 10000]
+CATEGORIES = ['REC', 'MED']
+LOGO_FILES = 8               # Distinct synthetic tier logos
+CATALOG_BRANDS = 5000        # Per category, for the lookup benchmark
+CATALOG_TIERS = 4            # Per brand
+LOOKUPS = 2000
+QUEUE_ITEMS = 50000          # Queue size for the memory measurement
+MIN_SECONDS = 0.05           # Timings below this are too noisy to flag as regressions
+STARTUP_RUNS = 5
+STARTUP_IMPORT_BUDGET = 0.15   # Seconds to import ui (the app is relaunched all day at the counter)
+STARTUP_WINDOW_BUDGET = 0.5    # Seconds from the first import to a drawn main window
+STARTUP_HEAVY_MODULES = ('reportlab.pdfgen', 'reportlab.pdfbase.pdfmetrics', 'PIL.Image', 'pdfmerge', 'cProfile')
+DEFAULT_OUTPUT = os.path.join('output', 'benchmark.json')
+MED_TIERS = ['Red Tier', 'Yellow Tier', 'Green Tier', 'Purple Tier']
+REC_TIERS = ['Popcorn', 'Buds', 'Premium', 'Deli']
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)  # bytes on macOS, KB elsewhere
+
+def make_logos(directory):
+    # Big-ish photos with alpha, like the logos people actually upload
+    from PIL import Image
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for n in range(LOGO_FILES):
+        img = Image.effect_noise((1600, 900), 40 + n).convert('RGBA')
+        path = os.path.join(directory, f"logo{n}.png")
+        img.save(path)
+        paths.append(path)
+    return paths
+
+def build_catalog(db_path, brands_per_category, tiers_per_brand, logos=None):
+    from database import init_db, sync_catalog
+    from models import PRICE_WEIGHTS
+    conn = init_db(db_path)
+    rows = []
+    for category in CATEGORIES:
+        names = MED_TIERS if category == 'MED' else REC_TIERS
+        for b in range(brands_per_category):
+            for t in range(tiers_per_brand):
+                prices = {weight: str(5 * (i + 1) + t) for i, weight in enumerate(PRICE_WEIGHTS)}
+                rows.append({'category': category, 'brand': f"Brand {b:05d}", 'tier': names[t % len(names)] + (f" {t}" if t >= len(names) else ''),
+                             'nametag_logo_path': logos[(b * tiers_per_brand + t) % len(logos)] if logos else None,
+                             'prices': prices})
+    sync_catalog(conn, rows)
+    return conn
+
+def run_case(case, repeat):
+    """Child process: builds the case's queue and times generate_pdf in a scratch directory."""
+    from catalog import Catalog
+    from generator import LabelGenerator
+    from models import Strain, CLASSIFICATIONS
+    os.chdir(tempfile.mkdtemp(prefix='jarlabeler-bench-'))  # Removed by the parent
+    logos = make_logos('logos') if case['logos'] else None
+    conn = build_catalog('catalog.db', 10, 4, logos)
+    catalog = Catalog(conn)
+    pairs = [(brand, tier) for brand in catalog.brands(case['category']) for tier in catalog.tiers(brand['id'])]
+    gen = LabelGenerator(conn)
+    gen.render_cache = None  # Times rendering; with the cache on, every repeat after the first would time replays
+    rng = random.Random(case['labels'])
+    for i in range(case['labels']):
+        brand, tier = pairs[i % len(pairs)]
+        strain = Strain(f"Strain {i}", rng.choice(CLASSIFICATIONS), round(rng.uniform(15, 32), 1), "Mother x Father" if i % 2 else '')
+        gen.add_to_queue(strain, brand, tier)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pdf_path = gen.generate_pdf(os.path.join('output', 'labels.pdf'))
+        times.append(time.perf_counter() - started)
+    return {'seconds': round(min(times), 4), 'first_seconds': round(times[0], 4),
+            'peak_rss_mb': peak_rss_mb(), 'pdf_bytes': os.path.getsize(pdf_path), 'workdir': os.getcwd()}
+
+def bench_generate(sizes, repeat):
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    for labels in sizes:
+        for category in CATEGORIES:
+            for logos in (False, True):
+                case = {'name': f"{category}-{labels}{'-logos' if logos else ''}", 'labels': labels, 'category': category, 'logos': logos}
+                with ctx.Pool(1) as pool:
+                    case.update(pool.apply(run_case, (case, repeat)))
+                shutil.rmtree(case.pop('workdir'), ignore_errors=True)
+                print(f"{case['name']:>18}: {case['seconds']:8.3f}s  {case['peak_rss_mb']} MB peak  {case['pdf_bytes'] / 1024:8.0f} KB")
+                results.append(case)
+    return results
+
+def bench_lookups():
+    """The Generate tab's lookups (brands for a category, tiers for a brand, one tier) on a large catalog."""
+    from catalog import Catalog
+    from database import get_tier_prices
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_catalog(os.path.join(tmp, 'catalog.db'), CATALOG_BRANDS, CATALOG_TIERS)
+        rng = random.Random(0)
+        picks = [(rng.choice(CATEGORIES), f"Brand {rng.randrange(CATALOG_BRANDS):05d}") for _ in range(LOOKUPS)]
+
+        def sql_lookup(category, name):
+            # What ui.py ran per selection before the in-memory catalog
+            [row[0] for row in conn.execute("SELECT name FROM brands WHERE category=?", (category,))]
+            brand_id = conn.execute("SELECT id FROM brands WHERE name=? AND category=?", (name, category)).fetchone()[0]
+            tiers = [row[0] for row in conn.execute("SELECT name FROM tiers WHERE brand_id=?", (brand_id,))]
+            tier_id = conn.execute("SELECT id FROM tiers WHERE brand_id=? AND name=?", (brand_id, tiers[0])).fetchone()[0]
+            get_tier_prices(conn, [tier_id])
+
+        catalog = Catalog(conn)
+
+        def catalog_lookup(category, name):
+            [brand['name'] for brand in catalog.brands(category)]
+            brand = catalog.brand(category, name)
+            tiers = [tier['name'] for tier in catalog.tiers(brand['id'])]
+            catalog.tier(brand['id'], tiers[0])
+
+        started = time.perf_counter()
+        catalog_lookup(*picks[0])  # First lookup loads the catalog
+        load = time.perf_counter() - started
+        result = {'brands': CATALOG_BRANDS * len(CATEGORIES), 'tiers': CATALOG_BRANDS * len(CATEGORIES) * CATALOG_TIERS,
+                  'catalog_load_seconds': round(load, 4)}
+        for label, lookup in (('sql', sql_lookup), ('catalog', catalog_lookup)):
+            times = []
+            for pick in picks:
+                started = time.perf_counter()
+                lookup(*pick)
+                times.append(time.perf_counter() - started)
+            times.sort()
+            result[f'{label}_mean_ms'] = round(statistics.mean(times) * 1000, 4)
+            result[f'{label}_p95_ms'] = round(times[int(len(times) * 0.95)] * 1000, 4)
+        conn.close()
+    print(f"lookups ({result['brands']} brands, {result['tiers']} tiers): SQL {result['sql_mean_ms']:.3f} ms, "
+          f"catalog {result['catalog_mean_ms']:.3f} ms (load {result['catalog_load_seconds']:.3f}s)")
+    return result
+
+def bench_queue_memory(items=QUEUE_ITEMS):
+    """Bytes held per queued pair, and the peak while queueing, for rows parsed as a CSV import would."""
+    from catalog import Catalog
+    from generator import LabelGenerator
+    from models import Strain, CLASSIFICATIONS
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = build_catalog(os.path.join(tmp, 'catalog.db'), 50, CATALOG_TIERS)
+        catalog = Catalog(conn)
+        gen = LabelGenerator(conn, metrics_path=None)
+        tiers = [(brand, tier) for category in CATEGORIES for brand in catalog.brands(category) for tier in catalog.tiers(brand['id'])]
+        lineages = ['', 'Blue Dream x OG Kush', 'Unknown']
+        tracemalloc.start()
+        for i in range(items):
+            # Fresh strings per row, as csv.DictReader produces them
+            strain = Strain(f"Strain {i % 3000:04d}", ''.join(CLASSIFICATIONS[i % 5]), float(f"{15 + i % 150 / 10}"), ''.join(lineages[i % 3]))
+            brand, tier = tiers[i % len(tiers)]
+            gen.add_to_queue(strain, brand, tier)
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        conn.close()
+    result = {'items': items, 'bytes_per_item': round(held / items), 'peak_mb': round(peak / 1e6, 2)}
+    print(f"queue memory ({items} pairs): {result['bytes_per_item']} bytes/pair, peak {result['peak_mb']} MB")
+    return result
+
+# Run in a fresh interpreter per launch: argv[1] is src/, the working directory holds db/
+STARTUP_SCRIPT = '''
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import ui
+imported = time.perf_counter() - started
+heavy = [name for name in sys.argv[2:] if name in sys.modules]
+window = None
+try:
+    root = ui.tk.Tk()
+except ui.tk.TclError:
+    root = None  # No display
+if root is not None:
+    ui.JarLabelerApp(root)
+    root.update()
+    window = time.perf_counter() - started
+    root.destroy()
+import json
+print(json.dumps({'import': imported, 'window': window, 'heavy': heavy}))
+'''
+
+def bench_startup():
+    """Best of STARTUP_RUNS launches against a small catalog; the first launch creates it and isn't timed."""
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+    with tempfile.TemporaryDirectory() as tmp:
+        build_catalog(os.path.join(tmp, 'db', 'jarlabeler.db'), 50, 4).close()
+        runs = []
+        for _ in range(STARTUP_RUNS + 1):
+            out = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, src, *STARTUP_HEAVY_MODULES],
+                                 cwd=tmp, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+    runs = runs[1:]
+    windows = [run['window'] for run in runs if run['window'] is not None]
+    result = {'import_seconds': round(min(run['import'] for run in runs), 4),
+              'window_seconds': round(min(windows), 4) if windows else None,
+              'heavy_modules': sorted({name for run in runs for name in run['heavy']})}
+    window = f"{result['window_seconds']:.3f}s" if windows else "n/a (no display)"
+    print(f"startup: import ui {result['import_seconds']:.3f}s, first window {window}")
+    return result
+
+def startup_problems(startup):
+    problems = []
+    if startup['import_seconds'] > STARTUP_IMPORT_BUDGET:
+        problems.append(f"importing ui took {startup['import_seconds']}s (budget {STARTUP_IMPORT_BUDGET}s)")
+    if startup['window_seconds'] is not None and startup['window_seconds'] > STARTUP_WINDOW_BUDGET:
+        problems.append(f"first window took {startup['window_seconds']}s (budget {STARTUP_WINDOW_BUDGET}s)")
+    if startup['heavy_modules']:
+        problems.append(f"loaded at startup: {', '.join(startup['heavy_modules'])}")
+    return problems
+
+def compare(results, baseline, threshold):
+    """Returns a line per metric that is more than threshold (a fraction) worse than the baseline."""
+    regressions = []
+
+    def check(name, metric, new, old, is_time):
+        if new is None or old is None or old <= 0:
+            return
+        if is_time and max(new, old) < MIN_SECONDS:
+            return
+        if new > old * (1 + threshold):
+            regressions.append(f"{name} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+
+    old_cases = {case['name']: case for case in baseline.get('generate', [])}
+    for case in results['generate']:
+        old = old_cases.get(case['name'])
+        if old:
+            check(case['name'], 'seconds', case['seconds'], old['seconds'], True)
+            check(case['name'], 'peak_rss_mb', case['peak_rss_mb'], old['peak_rss_mb'], False)
+            check(case['name'], 'pdf_bytes', case['pdf_bytes'], old['pdf_bytes'], False)
+    old_lookups = baseline.get('lookups')
+    if old_lookups and results.get('lookups'):
+        # Means over many lookups are steady enough to compare without a noise floor
+        check('lookups', 'catalog_load_seconds', results['lookups']['catalog_load_seconds'], old_lookups['catalog_load_seconds'], True)
+        check('lookups', 'catalog_mean_ms', results['lookups']['catalog_mean_ms'], old_lookups['catalog_mean_ms'], False)
+    old_queue = baseline.get('queue_memory')
+    if old_queue and results.get('queue_memory'):
+        check('queue_memory', 'bytes_per_item', results['queue_memory']['bytes_per_item'], old_queue['bytes_per_item'], False)
+    old_startup = baseline.get('startup')
+    if old_startup and results.get('startup'):
+        check('startup', 'import_seconds', results['startup']['import_seconds'], old_startup['import_seconds'], True)
+        check('startup', 'window_seconds', results['startup']['window_seconds'], old_startup.get('window_seconds'), True)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark label generation and catalog lookups")
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help="Comma-separated queue sizes (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=1, help="Time each case this many times and keep the best")
+    parser.add_argument('--skip-lookups', action='store_true', help="Only benchmark PDF generation")
+    parser.add_argument('--startup-only', action='store_true', help="Only check app startup against its budget")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="JSON results file (default: %(default)s)")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown/growth vs the baseline (default: %(default)s = 20%%)")
+    args = parser.parse_args(argv)
+    startup = bench_startup()
+    problems = startup_problems(startup)
+    for line in problems:
+        print(f"OVER BUDGET {line}")
+    if args.startup_only:
+        return 1 if problems else 0
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'startup': startup,
+        'generate': bench_generate([int(n) for n in args.sizes.split(',')], args.repeat),
+        'lookups': None if args.skip_lookups else bench_lookups(),
+        'queue_memory': bench_queue_memory(),
+    }
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
-import sqlite3
+import sys
 import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from database import init_db, sync_catalog, DB_PATH
 
 # From your REC spreadsheet
 rec_brands = {
@@ -29,60 +32,15 @@ med_brands = {
     'Long Gone Farms': ['Red Tier'],
 }
 
-# Database setup
-def init_db():
-    try:
-        os.makedirs('db', exist_ok=True)
-        print("Created 'db' folder if missing.")
-        conn = sqlite3.connect('db/jarlabeler.db')
-        print("Connected to DB file.")
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS brands
-                     (id INTEGER PRIMARY KEY, name TEXT, category TEXT, logo_path TEXT,
-                      UNIQUE(name, category))''')
-        c.execute('''CREATE TABLE IF NOT EXISTS tiers
-                     (id INTEGER PRIMARY KEY, brand_id INTEGER, name TEXT, nametag_bg_path TEXT, pricetag_bg_path TEXT)''')
-        conn.commit()
-        print("Tables created/verified.")
-        return conn
-    except Exception as e:
-        print(f"Error in init_db: {e}")
-        raise
-
 def seed_db():
-    conn = init_db()  # Create tables if not exist
-    c = conn.cursor()
-
-    # Seed REC
-    for brand, tiers in rec_brands.items():
-        try:
-            c.execute("INSERT OR IGNORE INTO brands (name, category) VALUES (?, 'REC')", (brand,))
-            conn.commit()
-            brand_id = c.execute("SELECT id FROM brands WHERE name=? AND category='REC'", (brand,)).fetchone()[0]
-            print(f"Inserted/ignored REC brand: {brand} (ID: {brand_id})")
-            for tier in tiers:
-                c.execute("INSERT OR IGNORE INTO tiers (brand_id, name) VALUES (?, ?)",
-                          (brand_id, tier))
-                print(f"  - Inserted/ignored tier: {tier}")
-        except Exception as e:
-            print(f"Error seeding REC {brand}: {e}")
-    conn.commit()
-
-    # Seed MED
-    for brand, tiers in med_brands.items():
-        try:
-            c.execute("INSERT OR IGNORE INTO brands (name, category) VALUES (?, 'MED')", (brand,))
-            conn.commit()
-            brand_id = c.execute("SELECT id FROM brands WHERE name=? AND category='MED'", (brand,)).fetchone()[0]
-            print(f"Inserted/ignored MED brand: {brand} (ID: {brand_id})")
-            for tier in tiers:
-                c.execute("INSERT OR IGNORE INTO tiers (brand_id, name) VALUES (?, ?)",
-                          (brand_id, tier))
-                print(f"  - Inserted/ignored tier: {tier}")
-        except Exception as e:
-            print(f"Error seeding MED {brand}: {e}")
-    conn.commit()
-    print("Seeding complete. Run the app to verify. DB file size: " + str(os.path.getsize('db/jarlabeler.db')) + " bytes")
+    conn = init_db()  # Creates the tables, or migrates an older database, first
+    rows = [{'category': category, 'brand': brand, 'tier': tier}
+            for category, brands in (('REC', rec_brands), ('MED', med_brands))
+            for brand, tiers in brands.items()
+            for tier in tiers]
+    brands, tiers, _, elapsed = sync_catalog(conn, rows)  # One transaction; existing rows are left as they are
+    print(f"Seeded {brands} brand(s) and {tiers} tier(s) in {elapsed:.3f}s ({len(rows) / max(elapsed, 1e-9):.0f} rows/s)")
+    print("Seeding complete. Run the app to verify. DB file size: " + str(os.path.getsize(DB_PATH)) + " bytes")
 
 if __name__ == "__main__":
-    seed_db()
\ No newline at end of file
+    seed_db()
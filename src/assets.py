@@ -0,0 +1,71 @@
+import os
+import hashlib
+
+PRINT_DPI = 300  # Logos are downsampled to this resolution for their printed size
+CACHE_DIR = os.path.join('cache', 'logos')
+
+class LogoAsset:
+    def __init__(self, path, width, height):
+        self.path = path        # File handed to reportlab (processed copy or the original if already small)
+        self.width = width      # Drawn size in points
+        self.height = height
+
+class LogoCache:
+    """Decodes and pre-scales each logo once, keyed by path + mtime.
+
+    Processed copies are kept in cache_dir so later runs skip the decode too.
+    Drawing the returned path (not an ImageReader) lets reportlab embed one
+    shared image object per logo for the whole PDF."""
+
+    def __init__(self, cache_dir=CACHE_DIR, dpi=PRINT_DPI):
+        self.cache_dir = cache_dir
+        self.dpi = dpi
+        self._assets = {}  # (abs path, mtime, box) -> LogoAsset
+        self._job = {}     # (logo path, box) -> LogoAsset or None, so each file is only stat'd once per job
+        self.decodes = 0   # Logos actually opened and scaled (cache misses), for job metrics
+
+    def begin_job(self):
+        self._job = {}
+
+    def get(self, logo_path, max_width, max_height):
+        job_key = (logo_path, max_width, max_height)
+        if job_key not in self._job:
+            self._job[job_key] = self._load(logo_path, max_width, max_height)
+        return self._job[job_key]
+
+    def _load(self, logo_path, max_width, max_height):
+        abs_path = os.path.abspath(logo_path)
+        try:
+            mtime = os.stat(abs_path).st_mtime_ns
+        except OSError:
+            return None
+        key = (abs_path, mtime, max_width, max_height)
+        asset = self._assets.get(key)
+        if asset is None:
+            asset = self._process(abs_path, mtime, max_width, max_height)
+            self._assets[key] = asset
+        return asset
+
+    def _process(self, abs_path, mtime, max_width, max_height):
+        from PIL import Image  # Only loaded once a job has a logo to decode
+        self.decodes += 1
+        with Image.open(abs_path) as img:  # Only the header is read until we resize
+            img_w, img_h = img.size
+            aspect = img_w / img_h
+            logo_width = min(max_width, max_height * aspect)
+            logo_height = logo_width / aspect if aspect > 1 else min(max_height, max_width / aspect)
+            target_w = max(1, round(logo_width / 72 * self.dpi))
+            target_h = max(1, round(logo_height / 72 * self.dpi))
+            if img_w <= target_w and img_h <= target_h:
+                return LogoAsset(abs_path, logo_width, logo_height)
+            digest = hashlib.sha1(f"{abs_path}|{mtime}|{target_w}x{target_h}".encode('utf-8')).hexdigest()[:20]
+            cached_path = os.path.join(self.cache_dir, digest + '.png')
+            if not os.path.exists(cached_path):
+                if img.mode not in ('RGB', 'RGBA'):
+                    img = img.convert('RGBA' if 'A' in img.mode or 'transparency' in img.info else 'RGB')
+                scaled = img.resize((target_w, target_h), Image.LANCZOS)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{cached_path}.{os.getpid()}.tmp"  # Parallel workers may process the same logo
+                scaled.save(tmp_path, 'PNG')
+                os.replace(tmp_path, cached_path)  # Never leave a half-written copy behind
+        return LogoAsset(cached_path, logo_width, logo_height)
@@ -0,0 +1,213 @@
+import os
+import socket
+import hashlib
+from generator import GenerationCancelled
+from layout import pricetag_key
+from metrics import JobMetrics
+
+ZPL_DPI = 203                 # Most desktop thermal printers; 300 dpi models need ZplBackend(dpi=300)
+ZPL_PORT = 9100               # Raw printing port
+GRAPHICS_DIR = os.path.join('cache', 'zpl')
+GRAPHIC_FORMAT = 2            # Part of each graphic's name; bump when _convert changes so old .grf files aren't reused
+
+class PdfBackend:
+    """Sheets of labels as a PDF, laid out on the generator's label stock."""
+
+    def write(self, gen, items, output, progress=None, cancel=None, metrics=None, workers=1):
+        return gen.generate_pdf(output, workers, items, progress, cancel, metrics)
+
+class ZplBackend:
+    """ZPL II for thermal printers: every nametag and pricetag is its own label.
+
+    Labels are the generator's label size; the stock's sheet layout does not
+    apply to a roll. Text and rules come from the same LabelTemplate ops as
+    the PDF, in the printer's scalable font 0. Like the PDF's forms, nothing
+    repeated is sent twice: each distinct pricetag is stored on the printer
+    as a format (^DF) and recalled by name (^XF), and each logo is converted
+    to a 1-bit graphic once (kept in GRAPHICS_DIR across runs), downloaded
+    with ~DG and recalled with ^XG. Stored items live in the printer's RAM
+    (R:) and are sent again with every job. Output is a .zpl file or, for
+    'host:port', the printer itself."""
+
+    def __init__(self, dpi=ZPL_DPI, graphics_dir=GRAPHICS_DIR, timeout=10):
+        self.dpi = dpi
+        self.graphics_dir = graphics_dir
+        self.timeout = timeout
+        self._graphics = {}  # (path, mtime, width, height, GRAPHIC_FORMAT) -> (name, ~DG command)
+
+    def write(self, gen, items, output, progress=None, cancel=None, metrics=None, workers=1):
+        # Same options as PdfBackend.write; labels go out in order as one stream, so workers is not used
+        if not items:
+            raise ValueError("Queue is empty. Add pairs first.")
+        job_metrics = metrics or JobMetrics('zpl')
+        sink = PrinterSink(output, self.timeout) if is_printer_address(output) else FileSink(output)
+        try:
+            sink.write(self._zpl(gen, items, progress, cancel, job_metrics))
+            sink.close()
+        except BaseException:
+            sink.abort()
+            raise
+        job_metrics.finish(pairs=len(items), output=output, zpl_bytes=sink.bytes, stock=gen.stock.name, dpi=self.dpi)
+        if metrics is None and gen.metrics_path:
+            job_metrics.write(gen.metrics_path)
+        return output
+
+    def _zpl(self, gen, items, progress, cancel, metrics):
+        # Yields the job as ZPL chunks: graphics as they are first needed, then the labels that use them
+        template = gen.template
+        # Label size and UTF-8 text persist on the printer, so they are set once for the job
+        yield f"^XA^CI28^PW{self._dots(template.label_width)}^LL{self._dots(template.label_height)}^LH0,0^XZ\n".encode('ascii')
+        downloaded = set()
+        pricetags = {}  # pricetag_key -> stored format name
+        gen.logos.begin_job()
+        for i, item in enumerate(items):
+            if cancel is not None and cancel.is_set():
+                raise GenerationCancelled()
+            brand, tier = item.brand, item.tier
+            with metrics.phase('decode'):
+                logo = gen._tier_logo(tier)
+                graphic = self._graphic(logo) if logo else None
+            if graphic and graphic[0] not in downloaded:
+                downloaded.add(graphic[0])
+                yield graphic[1]
+            with metrics.phase('layout'):
+                ops = template.nametag_ops(item.strain, brand, tier, logo)
+            with metrics.phase('draw'):
+                nametag = self._fields(ops, 0, template.label_width, graphic)
+                key = pricetag_key(brand, tier)
+                pricetag = pricetags.get(key)
+                if pricetag is None:
+                    pricetag = pricetags[key] = f"P{len(pricetags):07d}"
+                    fields = self._fields(template.pricetag_ops(brand, tier), template.label_width, template.label_width)
+                    yield f"^XA^DFR:{pricetag}.ZPL^FS{fields}^XZ\n".encode('utf-8')
+            yield f"^XA{nametag}^XZ\n^XA^XFR:{pricetag}.ZPL^FS^XZ\n".encode('utf-8')
+            metrics.count('labels')
+            if progress:
+                progress(i + 1, len(items))
+        metrics.count('graphics', len(downloaded))
+        metrics.count('pricetag_formats', len(pricetags))
+
+    def _dots(self, points):
+        return round(points * self.dpi / 72)
+
+    def _fields(self, ops, x_offset, label_width, graphic=None):
+        # One label's ops (pair coordinates, y down from the top is negative) as ZPL fields
+        fields = []
+        font_height = None
+        for op in ops:
+            kind = op[0]
+            if kind == 'text':
+                _, font, size, x, y, text, color, align = op
+                x -= x_offset
+                if self._dots(size) != font_height:
+                    font_height = self._dots(size)
+                    fields.append(f"^CF0,{font_height}")  # Default font for the fields that follow
+                data = zpl_text(text)
+                if align == 'centre':
+                    half = min(x, label_width - x)
+                    fields.append(f"^FT{self._dots(x - half)},{self._dots(-y)}^FB{self._dots(2 * half)},1,0,C{data}^FS")
+                else:
+                    fields.append(f"^FT{self._dots(x)},{self._dots(-y)}{data}^FS")
+            elif kind == 'line':
+                _, x1, y1, x2, y2, line_width = op
+                thickness = max(1, self._dots(line_width))
+                top = self._dots(-y1 - line_width / 2)
+                fields.append(f"^FO{self._dots(x1 - x_offset)},{top}^GB{max(thickness, self._dots(x2 - x1))},{thickness},{thickness}^FS")
+            elif kind == 'image' and graphic:
+                _, path, x, y, w, h = op
+                fields.append(f"^FO{self._dots(x - x_offset)},{self._dots(-(y + h))}^XGR:{graphic[0]}.GRF,1,1^FS")
+        return ''.join(fields)
+
+    def _graphic(self, logo):
+        # (name, ~DG download) for a logo at its printed size; converted once, then read from GRAPHICS_DIR
+        width, height = self._dots(logo.width), self._dots(logo.height)
+        try:
+            mtime = os.stat(logo.path).st_mtime_ns
+        except OSError:
+            return None
+        key = (logo.path, mtime, width, height, GRAPHIC_FORMAT)
+        graphic = self._graphics.get(key)
+        if graphic is None:
+            name = 'L' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:7].upper()
+            cached_path = os.path.join(self.graphics_dir, name + '.grf')
+            try:
+                with open(cached_path, 'rb') as f:
+                    command = f.read()
+            except OSError:
+                command = self._convert(logo.path, name, width, height)
+                os.makedirs(self.graphics_dir, exist_ok=True)
+                tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(command)
+                os.replace(tmp_path, cached_path)
+            graphic = self._graphics[key] = (name, command)
+        return graphic
+
+    def _convert(self, path, name, width, height):
+        from PIL import Image
+        with Image.open(path) as img:
+            img = img.convert('RGBA')
+            flat = Image.new('RGBA', img.size, 'white')  # Transparent areas print as blank paper
+            flat.alpha_composite(img)
+            mono = flat.convert('L').resize((width, height), Image.LANCZOS).convert('1')  # Dithered
+        row_bytes = (width + 7) // 8
+        if width % 8:
+            # PIL pads each row with 0 (black) bits up to a whole byte; pad with white so the edge doesn't print a bar
+            padded = Image.new('1', (row_bytes * 8, height), 1)
+            padded.paste(mono, (0, 0))
+            mono = padded
+        data = bytes(255 - b for b in mono.tobytes())  # PIL packs 1 as white; ZPL prints 1 as black
+        return f"~DGR:{name}.GRF,{len(data)},{row_bytes},{data.hex().upper()}\n".encode('ascii')
+
+def zpl_text(text):
+    # ^FD field data; with ^FH, the command prefixes and the escape character itself are sent as _hex
+    if '^' in text or '~' in text:
+        return '^FH^FD' + text.replace('_', '_5F').replace('^', '_5E').replace('~', '_7E')
+    return '^FD' + text
+
+def is_printer_address(output):
+    host, _, port = output.rpartition(':')
+    return bool(host) and port.isdigit() and not output.lower().endswith('.zpl')
+
+class FileSink:
+    # Writes to a temporary file that only replaces output once complete
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.f = open(self.tmp_path, 'wb')
+        self.bytes = 0
+
+    def write(self, chunks):
+        for chunk in chunks:
+            self.f.write(chunk)
+            self.bytes += len(chunk)
+
+    def close(self):
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+class PrinterSink:
+    # Streams to a network printer's raw port (host:port) as the labels are encoded
+    def __init__(self, address, timeout):
+        host, _, port = address.rpartition(':')
+        self.sock = socket.create_connection((host, int(port or ZPL_PORT)), timeout=timeout)
+        self.bytes = 0
+
+    def write(self, chunks):
+        for chunk in chunks:
+            self.sock.sendall(chunk)
+            self.bytes += len(chunk)
+
+    def close(self):
+        self.sock.shutdown(socket.SHUT_WR)
+        self.sock.close()
+
+    def abort(self):
+        self.sock.close()
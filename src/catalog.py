@@ -0,0 +1,83 @@
+from database import get_tier_prices
+
+class Catalog:
+    """In-memory copy of the brands/tiers tables, indexed for the lookups the UI does.
+
+    Loaded on first use with three queries. Nothing is re-read until
+    invalidate() is called, which the config screens do after each write, or
+    refresh() finds that another connection (the CLI, the service) has
+    committed since. With watch=True every lookup does that check first,
+    which is one PRAGMA rather than the reload. Brand and tier dicts are
+    shared, not copied; treat them as read-only."""
+
+    def __init__(self, conn, watch=False):
+        self.conn = conn
+        self.watch = watch
+        self._loaded = False
+        self._data_version = None
+
+    def invalidate(self):
+        self._loaded = False
+
+    def refresh(self):
+        # data_version changes when another connection commits, not for this connection's own writes
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._loaded = False
+            self._data_version = data_version
+
+    def _load(self):
+        self._brands = {}        # id -> brand
+        self._brand_names = {}   # (category, name) -> brand
+        self._by_category = {}   # category -> [brand, ...] in id order
+        self._tiers = {}         # id -> tier
+        self._tier_names = {}    # (brand_id, name) -> tier
+        self._by_brand = {}      # brand_id -> [tier, ...] in id order
+        for brand_id, name, category, logo_path in self.conn.execute("SELECT id, name, category, logo_path FROM brands ORDER BY id"):
+            brand = {'id': brand_id, 'name': name, 'category': category, 'logo_path': logo_path}
+            self._brands[brand_id] = brand
+            self._brand_names[(category, name)] = brand
+            self._by_category.setdefault(category, []).append(brand)
+        prices = get_tier_prices(self.conn)
+        for tier_id, brand_id, name, logo_path, price_version in self.conn.execute(
+                "SELECT id, brand_id, name, nametag_logo_path, price_version FROM tiers ORDER BY id"):
+            tier = {'id': tier_id, 'brand_id': brand_id, 'name': name, 'prices': prices.get(tier_id, {}),
+                    'nametag_logo_path': logo_path, 'price_version': price_version}
+            self._tiers[tier_id] = tier
+            self._tier_names.setdefault((brand_id, name), tier)  # First match wins, as with fetchone()
+            self._by_brand.setdefault(brand_id, []).append(tier)
+        self._loaded = True
+
+    def _ensure(self):
+        if self.watch:
+            self.refresh()
+        if not self._loaded:
+            self._load()
+
+    def brands(self, category=None):
+        self._ensure()
+        if category is None:
+            return list(self._brands.values())
+        return list(self._by_category.get(category, []))
+
+    def brand(self, category, name):
+        self._ensure()
+        return self._brand_names.get((category, name))
+
+    def brand_by_id(self, brand_id):
+        self._ensure()
+        return self._brands.get(brand_id)
+
+    def tiers(self, brand_id=None):
+        self._ensure()
+        if brand_id is None:
+            return list(self._tiers.values())
+        return list(self._by_brand.get(brand_id, []))
+
+    def tier(self, brand_id, name):
+        self._ensure()
+        return self._tier_names.get((brand_id, name))
+
+    def tier_by_id(self, tier_id):
+        self._ensure()
+        return self._tiers.get(tier_id)
@@ -0,0 +1,411 @@
+import sys
+import os
+# Add src/ to sys.path for relative imports to work when running directly
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import argparse
+import csv
+import json
+import tempfile
+import time
+from catalog import Catalog
+from database import init_db, bulk_update_prices, sync_catalog, SchemaError, DB_PATH
+from generator import LabelGenerator, DEFAULT_PDF_PATH
+from backends import PdfBackend, ZplBackend, ZPL_DPI
+from metrics import METRICS_PATH, JobMetrics, profiled
+from stock import STOCKS, DEFAULT_STOCK, load_stock
+from models import Strain, PRICE_WEIGHTS
+from registry import record_printed, stale_labels, reprint_batch, PrintJobRecorder
+from dispatch import Dispatcher, OpenViewer, PrintToQueue, ArchiveCopy, ARCHIVE_DIR
+from menu_import import diff_menu, apply_menu_diff
+
+DEFAULT_ZPL_PATH = os.path.join('output', 'labels.zpl')
+
+def read_rows(path, fmt=None):
+    # Streams strain rows as dicts from a CSV (with header) or JSONL file; '-' reads stdin. A JSONL line
+    # that isn't a JSON object is passed on as the ValueError saying so, for the caller's per-row handling
+    if fmt is None:
+        fmt = 'jsonl' if path.lower().endswith(('.jsonl', '.json', '.ndjson')) else 'csv'
+    f = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if fmt == 'csv':
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, json_row(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def json_row(line):
+    # A JSONL line as a row dict, or the ValueError for why it isn't one
+    try:
+        row = json.loads(line.rstrip('\r\n'))
+    except ValueError as e:
+        return ValueError(f"not valid JSON: {e.msg} (column {e.colno})")
+    if not isinstance(row, dict):
+        return ValueError(f"expected a JSON object, got {type(row).__name__}")
+    return row
+
+def resolve_row(row, catalog):
+    if isinstance(row, ValueError):
+        raise row
+    # JSONL values may be numbers or null, so every field is read as text
+    values = {field: ('' if row.get(field) is None else str(row[field])).strip()
+              for field in ('name', 'classification', 'thc', 'lineage', 'brand', 'category', 'tier')}
+    for field in ('name', 'classification', 'thc', 'brand', 'category', 'tier'):
+        if not values[field]:
+            raise ValueError(f"missing '{field}'")
+    brand = catalog.brand(values['category'], values['brand'])
+    if brand is None:
+        raise ValueError(f"unknown {values['category']} brand '{values['brand']}'")
+    tier = catalog.tier(brand['id'], values['tier'])
+    if tier is None:
+        raise ValueError(f"unknown tier '{values['tier']}' for brand '{values['brand']}'")
+    try:
+        thc = float(values['thc'])
+    except ValueError:
+        raise ValueError(f"THC '{values['thc']}' is not a number")
+    strain = Strain(values['name'], values['classification'], thc, values['lineage'])
+    return strain, brand, tier
+
+def cmd_generate(args):
+    if args.workers == 0:
+        args.workers = None
+    try:
+        stock = load_stock(args.stock)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    conn = init_db(args.db)
+    catalog = Catalog(conn)  # Loaded once up front instead of a lookup per row
+    gen = LabelGenerator(conn, metrics_path=args.metrics or None, stock=stock)
+    if args.no_cache:
+        gen.render_cache = None
+    if args.profile:
+        with profiled(args.profile):
+            return run_generate(args, gen, catalog)
+    return run_generate(args, gen, catalog)
+
+def run_generate(args, gen, catalog):
+    if args.zpl and (args.stream or args.workers != 1):
+        print("--zpl writes one label at a time; it can't be combined with --stream or --workers", file=sys.stderr)
+        return 1
+    if args.stream:
+        return stream_generate(args, gen, catalog)
+    errors = 0
+    for line_no, row in read_rows(args.input, args.format):
+        try:
+            gen.add_to_queue(*resolve_row(row, catalog))
+        except ValueError as e:
+            errors += 1
+            print(f"{args.input}:{line_no}: {e}", file=sys.stderr)
+    if errors and not args.skip_invalid:
+        print(f"{errors} invalid row(s); nothing generated (use --skip-invalid to print the rest)", file=sys.stderr)
+        return 1
+    if not gen.queue:
+        print("No labels to generate.", file=sys.stderr)
+        return 1
+    started = time.perf_counter()
+    if args.zpl:
+        output, backend = args.output if args.output != DEFAULT_PDF_PATH else DEFAULT_ZPL_PATH, ZplBackend(dpi=args.dpi)
+    else:
+        output, backend = args.output, PdfBackend()
+    metrics = JobMetrics('zpl' if args.zpl else 'generate')  # Written here so the dispatch record can refer to its id
+    try:
+        pdf_path = gen.generate(output, backend, workers=args.workers, metrics=metrics)
+    except OSError as e:
+        print(f"Could not write labels to {output}: {e}", file=sys.stderr)  # e.g. the printer did not answer
+        return 1
+    if gen.metrics_path:
+        metrics.write(gen.metrics_path)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {len(gen.queue)} label pair(s) to {pdf_path} in {elapsed:.2f}s")
+    if not args.no_record:
+        record_printed(gen.db_conn, ((item.strain, item.brand, item.tier) for item in gen.queue), pdf_path)
+    if not args.zpl and dispatch_output(args, pdf_path, metrics):
+        return 1
+    if args.compare_serial and args.workers != 1:
+        gen.render_cache = None  # Shards render every label, so the baseline must too, not replay this job's cache entries
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            gen.generate_pdf(os.path.join(tmp, 'serial.pdf'))
+            serial = time.perf_counter() - started
+        print(f"Serial run: {serial:.2f}s; parallel speedup {serial / elapsed:.2f}x")
+    return 0
+
+def stream_generate(args, gen, catalog):
+    # Rows are resolved as the generator pulls them; nothing is queued up front
+    def items():
+        for line_no, row in read_rows(args.input, args.format):
+            try:
+                yield resolve_row(row, catalog)
+            except ValueError as e:
+                if not args.skip_invalid:
+                    raise ValueError(f"{args.input}:{line_no}: {e}")
+                print(f"{args.input}:{line_no}: {e}", file=sys.stderr)
+    # Each chunk is recorded as it is flushed, so the registry doesn't hold the whole job either
+    recorder = None if args.no_record else PrintJobRecorder(gen.db_conn, args.output)
+    on_chunk = recorder and (lambda chunk: recorder.add((item.strain, item.brand, item.tier) for item in chunk))
+    metrics = JobMetrics('stream')
+    started = time.perf_counter()
+    try:
+        count = gen.generate_pdf_stream(items(), args.output, metrics=metrics, on_chunk=on_chunk)
+    except BaseException as e:
+        if recorder:
+            recorder.abort()
+        if not isinstance(e, ValueError):
+            raise
+        print(f"{e}; nothing generated", file=sys.stderr)
+        return 1
+    if recorder:
+        recorder.finish()
+    if gen.metrics_path:
+        metrics.write(gen.metrics_path)
+    print(f"Wrote {count} label pair(s) to {args.output} in {time.perf_counter() - started:.2f}s")
+    return 1 if dispatch_output(args, args.output, metrics) else 0
+
+def dispatch_output(args, pdf_path, metrics):
+    # Runs --open/--print/--archive on the finished PDF (metrics: its generation job); returns the steps that failed
+    steps = []
+    if args.open:
+        steps.append(OpenViewer())
+    if args.print is not None:
+        steps.append(PrintToQueue(args.print or None, args.copies))
+    if args.archive:
+        steps.append(ArchiveCopy(args.archive))
+    if not steps:
+        return []
+    dispatcher = Dispatcher(metrics_path=args.metrics or None)
+    job = dispatcher.submit(pdf_path, steps, for_job=metrics.id)
+    dispatcher.wait()  # The dispatch thread would die with the process
+    for name, state in job.states.items():
+        detail = state['error'] if state['status'] in ('failed', 'skipped') else state['result']
+        print(f"{name}: {state['status']}" + (f" ({detail})" if detail else ""), file=sys.stderr if state['status'] == 'failed' else sys.stdout)
+    return job.errors()
+
+def cmd_reprints(args):
+    conn = init_db(args.db)
+    labels = stale_labels(conn)
+    if not labels:
+        print("No printed labels show old prices.")
+        return 0
+    catalog = Catalog(conn)
+    for label in labels:
+        tier = catalog.tier_by_id(label['tier_id'])
+        brand = catalog.brand_by_id(label['brand_id'])
+        print(f"{label['printed_at']}  {brand['category']} - {brand['name']} - {tier['name']} - {label['strain'].name}")
+    print(f"{len(labels)} printed label(s) show old prices")
+    if not args.output:
+        return 0
+    try:
+        stock = load_stock(args.stock)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    gen = LabelGenerator(conn, metrics_path=None, stock=stock)
+    batch = reprint_batch(conn, catalog)
+    for label in batch:
+        gen.add_to_queue(*label)
+    pdf_path = gen.generate_pdf(args.output)
+    record_printed(conn, batch, pdf_path)
+    print(f"Wrote {len(batch)} reprint(s) to {pdf_path}")
+    return 0
+
+def cmd_prices(args):
+    conn = init_db(args.db)
+    try:
+        count = bulk_update_prices(conn, args.category, args.brand, args.tier, args.weight,
+                                   add=args.add, percent=args.percent, dry_run=args.dry_run)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"{'Would update' if args.dry_run else 'Updated'} {count} price(s)")
+    return 0
+
+def catalog_row(row):
+    # CSV/JSONL catalog row -> sync_catalog() row; prices come from 1g..1lb columns or a 'prices' object
+    if isinstance(row, ValueError):
+        raise row
+    category = (row.get('category') or '').strip().upper()
+    brand = (row.get('brand') or '').strip()
+    if category not in ('REC', 'MED'):
+        raise ValueError(f"category must be REC or MED, got '{row.get('category')}'")
+    if not brand:
+        raise ValueError("missing 'brand'")
+    prices = dict(row.get('prices') or {})
+    for weight in PRICE_WEIGHTS:
+        if str(row.get(weight) or '').strip():
+            prices[weight] = row[weight]
+    return {'category': category, 'brand': brand, 'logo_path': row.get('logo_path') or None,
+            'tier': (row.get('tier') or '').strip(), 'nametag_logo_path': row.get('nametag_logo_path') or None,
+            'prices': prices}
+
+def cmd_sync(args):
+    rows, errors = [], 0
+    for line_no, row in read_rows(args.input, args.format):
+        try:
+            rows.append(catalog_row(row))
+        except ValueError as e:
+            errors += 1
+            print(f"{args.input}:{line_no}: {e}", file=sys.stderr)
+    if errors:
+        print(f"{errors} invalid row(s); nothing synced", file=sys.stderr)
+        return 1
+    conn = init_db(args.db)
+    try:
+        brands, tiers, prices, elapsed = sync_catalog(conn, rows)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Synced {len(rows)} row(s): {brands} brand(s), {tiers} tier(s), {prices} price(s) "
+          f"in {elapsed:.3f}s ({len(rows) / max(elapsed, 1e-9):.0f} rows/s)")
+    return 0
+
+def cmd_import_menu(args):
+    errors = 0
+    def rows():
+        nonlocal errors
+        for line_no, row in read_rows(args.input, args.format):
+            try:
+                yield catalog_row(row)
+            except ValueError as e:
+                errors += 1
+                print(f"{args.input}:{line_no}: {e}", file=sys.stderr)
+    conn = init_db(args.db)
+    started = time.perf_counter()
+    try:
+        diff = diff_menu(conn, rows())
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if errors:
+        print(f"{errors} invalid row(s); nothing imported", file=sys.stderr)
+        return 1
+    print(f"Read {diff.rows} row(s) in {time.perf_counter() - started:.3f}s: {diff.summary()}")
+    if args.dry_run or not diff.changes():
+        return 0
+    print(f"Applied {diff.changes()} change(s) in {apply_menu_diff(conn, diff):.3f}s")
+    return 0
+
+def cmd_serve(args):
+    from service import serve, SERVICE_PORT  # http.server etc. only load for these commands
+    init_db(args.db).close()  # Migrate once here rather than racing in every worker
+    serve(args.host, args.port or SERVICE_PORT, max(1, args.workers or os.cpu_count() or 1), args.db)
+    return 0
+
+def cmd_submit(args):
+    from service import submit_job, SERVICE_PORT
+    items, errors = [], 0
+    for line_no, row in read_rows(args.input, args.format):
+        if isinstance(row, ValueError):
+            errors += 1
+            print(f"{args.input}:{line_no}: {row}", file=sys.stderr)
+        else:
+            items.append(row)
+    if errors:
+        print(f"{errors} invalid row(s); nothing submitted", file=sys.stderr)
+        return 1
+    if not items:
+        print("No labels to generate.", file=sys.stderr)
+        return 1
+    fmt = 'zpl' if args.zpl else 'pdf'
+    output = args.output or (DEFAULT_ZPL_PATH if args.zpl else DEFAULT_PDF_PATH)
+    started = time.perf_counter()
+    try:
+        job, data = submit_job(args.service or f"http://127.0.0.1:{SERVICE_PORT}", items, args.stock, fmt)
+    except (OSError, ValueError) as e:
+        print(f"Job failed: {e}", file=sys.stderr)
+        return 1
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'wb') as f:
+        f.write(data)
+    print(f"Wrote {job['pairs']} label pair(s) to {output} in {time.perf_counter() - started:.2f}s (job {job['id']})")
+    return 0
+
+def cmd_stocks(args):
+    for stock in STOCKS.values():
+        print(f"{stock.name:<16}{stock.description}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='jarlabeler', description="Jar name tag and pricetag generator")
+    sub = parser.add_subparsers(dest='command', required=True)
+    gen = sub.add_parser('generate', help="Generate a label PDF from a CSV/JSONL file of strains")
+    gen.add_argument('input', help="CSV or JSONL file with name, classification, thc, lineage, brand, category, tier ('-' for stdin)")
+    gen.add_argument('-o', '--output', default=DEFAULT_PDF_PATH, help="PDF path to write (default: %(default)s; with --zpl, a .zpl file or a printer's host:port)")
+    gen.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+    gen.add_argument('--db', default=DB_PATH, help="Catalog database (default: %(default)s)")
+    gen.add_argument('--stock', default=DEFAULT_STOCK, help="Label sheet: a built-in name (see 'jarlabeler stocks') or a JSON file (default: %(default)s)")
+    gen.add_argument('--workers', type=int, default=1, help="Render page-aligned shards in this many processes (0 = one per CPU)")
+    gen.add_argument('--zpl', action='store_true', help=f"Thermal printer output (ZPL) instead of a PDF; defaults to {DEFAULT_ZPL_PATH}")
+    gen.add_argument('--dpi', type=int, default=ZPL_DPI, help="Thermal printer resolution for --zpl (default: %(default)s)")
+    gen.add_argument('--open', action='store_true', help="Open the PDF in the desktop viewer when done (skipped without a display)")
+    gen.add_argument('--print', nargs='?', const='', metavar='QUEUE', help="Print the PDF with lp, to QUEUE or the default printer")
+    gen.add_argument('--copies', type=int, default=1, help="Copies for --print (default: %(default)s)")
+    gen.add_argument('--archive', nargs='?', const=ARCHIVE_DIR, metavar='DIR', help=f"Keep a dated copy of the PDF in DIR (default: {ARCHIVE_DIR})")
+    gen.add_argument('--stream', action='store_true', help="Constant-memory mode: render and flush pages while the input is still being read")
+    gen.add_argument('--compare-serial', action='store_true', help="Also time a serial render and report the parallel speedup")
+    gen.add_argument('--skip-invalid', action='store_true', help="Skip rows that do not resolve instead of aborting")
+    gen.add_argument('--metrics', default=METRICS_PATH, help="Append a JSONL record of per-phase timings here ('' to disable; default: %(default)s)")
+    gen.add_argument('--no-cache', action='store_true', help="Draw every label instead of reusing unchanged ones from cache/labels.db")
+    gen.add_argument('--profile', metavar='PATH', help="Run the job under cProfile and write the stats to PATH")
+    gen.add_argument('--no-record', action='store_true', help="Don't add these labels to the printed-label registry (e.g. test prints)")
+    gen.set_defaults(func=cmd_generate)
+    prices = sub.add_parser('prices', help="Adjust many tier prices at once, e.g. --category MED --tier 'Red Tier' --weight 3.5g --add 5")
+    prices.add_argument('--category', choices=['REC', 'MED'], help="Only this category")
+    prices.add_argument('--brand', help="Only this brand")
+    prices.add_argument('--tier', help="Only tiers with this name")
+    prices.add_argument('--weight', choices=PRICE_WEIGHTS, help="Only this weight")
+    prices.add_argument('--add', type=float, default=0, help="Dollars to add (negative to lower)")
+    prices.add_argument('--percent', type=float, default=0, help="Percentage change, applied before --add (-20 for a 20%% sale)")
+    prices.add_argument('--dry-run', action='store_true', help="Report how many prices would change without saving")
+    prices.add_argument('--db', default=DB_PATH, help="Catalog database (default: %(default)s)")
+    prices.set_defaults(func=cmd_prices)
+    sync = sub.add_parser('sync', help="Add or update brands, tiers and prices from a CSV/JSONL catalog in one transaction")
+    sync.add_argument('input', help="CSV or JSONL file with category, brand, tier and optional logo_path, nametag_logo_path, 1g..1lb ('-' for stdin)")
+    sync.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+    sync.add_argument('--db', default=DB_PATH, help="Catalog database (default: %(default)s)")
+    sync.set_defaults(func=cmd_sync)
+    menu = sub.add_parser('import-menu', help="Make the catalog match a POS menu export, applying only what changed")
+    menu.add_argument('input', help="CSV or JSONL export with category, brand, tier and optional logo_path, nametag_logo_path, 1g..1lb ('-' for stdin)")
+    menu.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+    menu.add_argument('--dry-run', action='store_true', help="Report what would change without changing anything")
+    menu.add_argument('--db', default=DB_PATH, help="Catalog database (default: %(default)s)")
+    menu.set_defaults(func=cmd_import_menu)
+    reprints = sub.add_parser('reprints', help="List printed labels whose prices have changed since, and optionally print replacements")
+    reprints.add_argument('-o', '--output', help="Generate the replacement labels to this PDF")
+    reprints.add_argument('--stock', default=DEFAULT_STOCK, help="Label sheet for the replacements (default: %(default)s)")
+    reprints.add_argument('--db', default=DB_PATH, help="Catalog database (default: %(default)s)")
+    reprints.set_defaults(func=cmd_reprints)
+    serve = sub.add_parser('serve', help="Run the local print-job service that stations submit label jobs to")
+    serve.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: %(default)s; 0.0.0.0 for other machines)")
+    serve.add_argument('--port', type=int, help="Port to listen on (default: 8765)")
+    serve.add_argument('--workers', type=int, default=2, help="Jobs rendered at once, each in its own process (0 = one per CPU; default: %(default)s)")
+    serve.add_argument('--db', default=DB_PATH, help="Catalog database (default: %(default)s)")
+    serve.set_defaults(func=cmd_serve)
+    submit = sub.add_parser('submit', help="Send a CSV/JSONL file of strains to the print-job service and save the result")
+    submit.add_argument('input', help="CSV or JSONL file, as for 'generate' ('-' for stdin)")
+    submit.add_argument('-o', '--output', help=f"Where to save the result (default: {DEFAULT_PDF_PATH}, or {DEFAULT_ZPL_PATH} with --zpl)")
+    submit.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from the file extension)")
+    submit.add_argument('--service', help="Service URL (default: http://127.0.0.1:8765)")
+    submit.add_argument('--stock', default=DEFAULT_STOCK, help="Built-in label sheet (default: %(default)s)")
+    submit.add_argument('--zpl', action='store_true', help="Thermal printer output (ZPL) instead of a PDF")
+    submit.set_defaults(func=cmd_submit)
+    stocks = sub.add_parser('stocks', help="List the built-in label sheets")
+    stocks.set_defaults(func=cmd_stocks)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except SchemaError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
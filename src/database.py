@@ -1,14 +1,286 @@
 import sqlite3
 import os
+import json
+import time
 
-def init_db():
-    os.makedirs('db', exist_ok=True)
-    conn = sqlite3.connect('db/jarlabeler.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS brands
-                 (id INTEGER PRIMARY KEY, name TEXT, category TEXT, logo_path TEXT,
-                  UNIQUE(name, category))''')
-    c.execute('''CREATE TABLE IF NOT EXISTS tiers
-                 (id INTEGER PRIMARY KEY, brand_id INTEGER, name TEXT, prices TEXT DEFAULT '{}', nametag_logo_path TEXT)''')
-    conn.commit()
-    return conn
\ No newline at end of file
+DB_PATH = os.path.join('db', 'jarlabeler.db')
+SCHEMA_VERSION = 4  # PRAGMA user_version once all migrations below have run
+
+class SchemaError(Exception):
+    """The database can't be used or migrated by this version."""
+
+def init_db(db_path=DB_PATH):
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")  # The UI keeps reading while a sync is writing
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        conn.close()
+        raise SchemaError(f"{db_path} is schema version {version}, newer than this JarLabeler supports ({SCHEMA_VERSION})")
+    if version == SCHEMA_VERSION:
+        return conn  # Already current; nothing to create or migrate on a normal launch
+    if not _columns(conn, 'tiers'):
+        version = SCHEMA_VERSION  # New database, created below in the current layout
+    conn.execute("BEGIN")  # Tables and migrations commit together or not at all
+    try:
+        _create_tables(conn)
+        for target, migrate in MIGRATIONS:
+            if version < target:
+                print(f"Migrating {db_path} to schema version {target}")
+                migrate(conn)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_brands_category ON brands (category)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tier_prices_weight ON tier_prices (weight)")
+        _create_registry(conn)
+        _create_strain_library(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    return conn
+
+def _create_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS brands
+                    (id INTEGER PRIMARY KEY, name TEXT, category TEXT, logo_path TEXT,
+                     UNIQUE(name, category))''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS tiers
+                    (id INTEGER PRIMARY KEY, brand_id INTEGER, name TEXT, nametag_logo_path TEXT,
+                     price_version INTEGER NOT NULL DEFAULT 0, UNIQUE(brand_id, name))''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS tier_prices
+                    (tier_id INTEGER NOT NULL, weight TEXT NOT NULL, price REAL NOT NULL,
+                     PRIMARY KEY (tier_id, weight))''')
+
+def _create_registry(conn):
+    # Printed-label history (see registry.py). Every change to a tier's prices bumps its price_version,
+    # so a printed label is stale once its tier's version has moved past the one it was printed at.
+    conn.execute('''CREATE TABLE IF NOT EXISTS print_jobs
+                    (id INTEGER PRIMARY KEY, printed_at TEXT NOT NULL, output TEXT, pairs INTEGER)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS printed_labels
+                    (id INTEGER PRIMARY KEY, job_id INTEGER NOT NULL, strain TEXT NOT NULL, classification TEXT,
+                     thc REAL, lineage TEXT, brand_id INTEGER, tier_id INTEGER NOT NULL,
+                     price_version INTEGER NOT NULL, current INTEGER NOT NULL DEFAULT 1)''')
+    # Only the latest print of a strain/tier is current; both indexes cover just those rows
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_printed_current ON printed_labels (tier_id, price_version) WHERE current = 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_printed_strain ON printed_labels (strain, tier_id) WHERE current = 1")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS tier_prices_insert AFTER INSERT ON tier_prices
+                    BEGIN UPDATE tiers SET price_version = price_version + 1 WHERE id = NEW.tier_id; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS tier_prices_update AFTER UPDATE OF price ON tier_prices
+                    WHEN OLD.price IS NOT NEW.price
+                    BEGIN UPDATE tiers SET price_version = price_version + 1 WHERE id = NEW.tier_id; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS tier_prices_delete AFTER DELETE ON tier_prices
+                    BEGIN UPDATE tiers SET price_version = price_version + 1 WHERE id = OLD.tier_id; END''')
+
+def _create_strain_library(conn):
+    # Strains for type-ahead (see strains.py), with an FTS5 index on the name kept in sync by triggers
+    conn.execute('''CREATE TABLE IF NOT EXISTS strains
+                    (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE, classification TEXT,
+                     thc REAL, lineage TEXT, uses INTEGER NOT NULL DEFAULT 0, used_at TEXT)''')
+    try:
+        # prefix='1 2 3': the first few letters typed are looked up directly instead of scanning the terms
+        conn.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS strains_fts USING fts5
+                        (name, content='strains', content_rowid='id', prefix='1 2 3', tokenize='unicode61 remove_diacritics 2')''')
+    except sqlite3.OperationalError:
+        print("SQLite was built without FTS5; strain search will only match the start of names")
+        return
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS strains_insert AFTER INSERT ON strains
+                    BEGIN INSERT INTO strains_fts (rowid, name) VALUES (NEW.id, NEW.name); END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS strains_delete AFTER DELETE ON strains
+                    BEGIN INSERT INTO strains_fts (strains_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name); END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS strains_rename AFTER UPDATE OF name ON strains
+                    BEGIN INSERT INTO strains_fts (strains_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+                          INSERT INTO strains_fts (rowid, name) VALUES (NEW.id, NEW.name); END''')
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _migrate_json_prices(conn):
+    # Moves the old tiers.prices JSON blobs into tier_prices rows
+    if 'prices' not in _columns(conn, 'tiers'):
+        return  # seed_db.py databases never had prices
+    rows = []
+    for tier_id, prices in conn.execute("SELECT id, prices FROM tiers WHERE prices IS NOT NULL AND prices NOT IN ('', '{}')"):
+        try:
+            parsed = json.loads(prices)
+        except ValueError:
+            print(f"Skipping unreadable prices for tier {tier_id}: {prices!r}")
+            continue
+        for weight, text in parsed.items():
+            try:
+                amount = parse_amount(text)
+            except ValueError:
+                print(f"Skipping non-numeric {weight} price for tier {tier_id}: {text!r}")
+                continue
+            if amount is not None:
+                rows.append((tier_id, weight, amount))
+    conn.executemany("INSERT OR REPLACE INTO tier_prices (tier_id, weight, price) VALUES (?, ?, ?)", rows)
+    conn.execute("UPDATE tiers SET prices = NULL")  # tier_prices is the only source of truth from here on
+
+def _migrate_catalog_tables(conn):
+    # Rebuilds brands/tiers in the current layout: drops seed_db.py's nametag_bg_path/pricetag_bg_path
+    # and the old prices column, adds missing logo columns, and merges duplicates so names are unique
+    brand_cols, tier_cols = _columns(conn, 'brands'), _columns(conn, 'tiers')
+    for table, cols, required in (('brands', brand_cols, ('id', 'name', 'category')), ('tiers', tier_cols, ('id', 'brand_id', 'name'))):
+        missing = [col for col in required if col not in cols]
+        if missing:
+            raise SchemaError(f"Unrecognised {table} table (no {', '.join(missing)} column); not migrating")
+    brand_logo = 'logo_path' if 'logo_path' in brand_cols else 'NULL'
+    tier_logo = 'nametag_logo_path' if 'nametag_logo_path' in tier_cols else 'NULL'
+    brands, brand_ids = {}, {}
+    for brand_id, name, category, logo_path in conn.execute(f"SELECT id, name, category, {brand_logo} FROM brands ORDER BY id"):
+        kept = brands.setdefault((name, category), (brand_id, name, category, logo_path))
+        brand_ids[brand_id] = kept[0]
+    tiers = {}
+    for tier_id, brand_id, name, logo_path in conn.execute(f"SELECT id, brand_id, name, {tier_logo} FROM tiers ORDER BY id"):
+        brand_id = brand_ids.get(brand_id, brand_id)
+        tiers.setdefault((brand_id, name), (tier_id, brand_id, name, logo_path))
+    merged = len(brand_ids) - len(brands), conn.execute("SELECT COUNT(*) FROM tiers").fetchone()[0] - len(tiers)
+    if any(merged):
+        print(f"Merged {merged[0]} duplicate brand(s) and {merged[1]} duplicate tier(s)")
+    conn.execute("DROP TABLE brands")
+    conn.execute("DROP TABLE tiers")
+    _create_tables(conn)
+    conn.executemany("INSERT INTO brands (id, name, category, logo_path) VALUES (?, ?, ?, ?)", brands.values())
+    conn.executemany("INSERT INTO tiers (id, brand_id, name, nametag_logo_path) VALUES (?, ?, ?, ?)", tiers.values())
+    conn.execute("DELETE FROM tier_prices WHERE tier_id NOT IN (SELECT id FROM tiers)")
+
+def _migrate_price_versions(conn):
+    # Adds tiers.price_version for the printed-label registry (tables rebuilt by migration 2 already have it)
+    if 'price_version' not in _columns(conn, 'tiers'):
+        conn.execute("ALTER TABLE tiers ADD COLUMN price_version INTEGER NOT NULL DEFAULT 0")
+
+def _migrate_strain_library(conn):
+    # Starts the strain library with every strain already in the printed-label registry, latest details first
+    _create_registry(conn)
+    _create_strain_library(conn)
+    conn.execute('''INSERT INTO strains (name, classification, thc, lineage, uses, used_at)
+                    SELECT p.strain, p.classification, p.thc, p.lineage, latest.uses, latest.used_at
+                    FROM (SELECT MAX(p.id) AS id, COUNT(*) AS uses, MAX(j.printed_at) AS used_at
+                          FROM printed_labels p JOIN print_jobs j ON j.id = p.job_id
+                          GROUP BY p.strain COLLATE NOCASE) latest
+                    JOIN printed_labels p ON p.id = latest.id
+                    WHERE true ON CONFLICT (name) DO NOTHING''')
+
+# (schema version, migration) in order; each runs once, when the database is older than its version
+MIGRATIONS = [
+    (1, _migrate_json_prices),
+    (2, _migrate_catalog_tables),
+    (3, _migrate_price_versions),
+    (4, _migrate_strain_library),
+]
+
+def sync_catalog(conn, rows):
+    """Upserts catalog rows in a single transaction.
+
+    Each row is a dict with 'category' and 'brand', and optionally 'logo_path',
+    'tier', 'nametag_logo_path' and 'prices' ({weight: text}). Existing brands
+    and tiers are matched by name; logos are only replaced when given and
+    only the given weights' prices are changed. Returns
+    (brands, tiers, prices, seconds)."""
+    started = time.perf_counter()
+    brands, tiers, prices = {}, {}, {}
+    for row in rows:
+        category, brand = row['category'], row['brand']
+        if brands.get((brand, category)) is None:
+            brands[(brand, category)] = row.get('logo_path')
+        if row.get('tier'):
+            key = (brand, category, row['tier'])
+            if tiers.get(key) is None:
+                tiers[key] = row.get('nametag_logo_path')
+            for weight, text in (row.get('prices') or {}).items():
+                try:
+                    amount = parse_amount(text)
+                except ValueError:
+                    raise ValueError(f"{brand} {row['tier']}: {weight} price must be a number, got {text!r}")
+                if amount is not None:
+                    prices[key + (weight,)] = amount
+    with conn:
+        conn.executemany('''INSERT INTO brands (name, category, logo_path) VALUES (?, ?, ?)
+                            ON CONFLICT (name, category) DO UPDATE SET logo_path = COALESCE(excluded.logo_path, logo_path)''',
+                         [(name, category, logo) for (name, category), logo in brands.items()])
+        brand_ids = {(name, category): brand_id for brand_id, name, category in conn.execute("SELECT id, name, category FROM brands")}
+        conn.executemany('''INSERT INTO tiers (brand_id, name, nametag_logo_path) VALUES (?, ?, ?)
+                            ON CONFLICT (brand_id, name) DO UPDATE SET nametag_logo_path = COALESCE(excluded.nametag_logo_path, nametag_logo_path)''',
+                         [(brand_ids[(brand, category)], tier, logo) for (brand, category, tier), logo in tiers.items()])
+        tier_ids = {(brand_id, name): tier_id for tier_id, brand_id, name in conn.execute("SELECT id, brand_id, name FROM tiers")}
+        conn.executemany('''INSERT INTO tier_prices (tier_id, weight, price) VALUES (?, ?, ?)
+                            ON CONFLICT (tier_id, weight) DO UPDATE SET price = excluded.price''',
+                         [(tier_ids[(brand_ids[(brand, category)], tier)], weight, amount)
+                          for (brand, category, tier, weight), amount in prices.items()])
+    return len(brands), len(tiers), len(prices), time.perf_counter() - started
+
+def parse_amount(text):
+    # '' / None -> None (no price for that weight); '$12.50' -> 12.5
+    if text is None:
+        return None
+    text = str(text).strip().lstrip('$').strip()
+    if not text:
+        return None
+    amount = float(text)
+    if amount < 0:
+        raise ValueError(f"negative price {text}")
+    return amount
+
+def format_amount(amount):
+    # 35.0 -> '35', 12.5 -> '12.50'
+    return str(int(amount)) if amount == int(amount) else f"{amount:.2f}"
+
+def get_tier_prices(conn, tier_ids=None):
+    """{tier_id: {weight: '12.50'}} for the given tiers (all tiers if None)."""
+    if tier_ids is None:
+        rows = conn.execute("SELECT tier_id, weight, price FROM tier_prices")
+    else:
+        tier_ids = list(tier_ids)
+        placeholders = ','.join('?' * len(tier_ids))
+        rows = conn.execute(f"SELECT tier_id, weight, price FROM tier_prices WHERE tier_id IN ({placeholders})", tier_ids)
+    prices = {tier_id: {} for tier_id in (tier_ids or [])}
+    for tier_id, weight, price in rows:
+        prices.setdefault(tier_id, {})[weight] = format_amount(price)
+    return prices
+
+def set_tier_prices(conn, tier_id, prices):
+    """Replaces a tier's prices from {weight: text}; blank entries are removed. Caller commits.
+
+    Prices that did not change are left alone, so saving a tier without
+    touching its prices does not make its printed labels stale."""
+    rows = []
+    for weight, text in prices.items():
+        try:
+            amount = parse_amount(text)
+        except ValueError:
+            raise ValueError(f"{weight} price must be a number, got {text!r}")
+        if amount is not None:
+            rows.append((tier_id, weight, amount))
+    weights = [weight for _, weight, _ in rows]
+    conn.execute(f"DELETE FROM tier_prices WHERE tier_id=? AND weight NOT IN ({','.join('?' * len(weights))})", [tier_id] + weights)
+    conn.executemany('''INSERT INTO tier_prices (tier_id, weight, price) VALUES (?, ?, ?)
+                        ON CONFLICT (tier_id, weight) DO UPDATE SET price = excluded.price''', rows)
+
+def delete_tier_prices(conn, tier_ids):
+    conn.executemany("DELETE FROM tier_prices WHERE tier_id=?", [(tier_id,) for tier_id in tier_ids])
+
+def bulk_update_prices(conn, category=None, brand=None, tier=None, weight=None, add=0, percent=0, dry_run=False):
+    """Adjusts every matching price in one set-based UPDATE and transaction.
+
+    Filters left as None match everything, e.g.
+        bulk_update_prices(conn, category='MED', tier='Red Tier', weight='3.5g', add=5)
+        bulk_update_prices(conn, brand='Cherry', percent=-20)
+    Prices are scaled by percent first, then add is applied; results are
+    rounded to cents and never drop below zero. Returns the number of
+    prices changed (dry_run rolls the change back)."""
+    if not add and not percent:
+        raise ValueError("Give an amount to add or a percentage to apply.")
+    factor = 1 + percent / 100
+    params = (factor, add, weight, weight, category, category, brand, brand, tier, tier)
+    with conn:
+        cur = conn.execute('''UPDATE tier_prices SET price = MAX(0, ROUND(price * ? + ?, 2))
+                              WHERE (? IS NULL OR weight = ?)
+                                AND tier_id IN (SELECT t.id FROM tiers t JOIN brands b ON b.id = t.brand_id
+                                                WHERE (? IS NULL OR b.category = ?)
+                                                  AND (? IS NULL OR b.name = ?)
+                                                  AND (? IS NULL OR t.name = ?))''', params)
+        changed = cur.rowcount
+        if dry_run:
+            conn.rollback()
+    return changed
@@ -0,0 +1,212 @@
+import os
+import sys
+import time
+import shutil
+import itertools
+import threading
+import subprocess
+from datetime import datetime
+from queue import Queue
+from metrics import JobMetrics, DISPATCH_PHASES
+
+DISPATCH_RETRIES = 2       # Extra attempts for a step that fails (not for the viewer)
+RETRY_DELAY = 2.0          # Seconds before the first retry; doubles each time
+LP_TIMEOUT = 60
+ARCHIVE_DIR = os.path.join('output', 'archive')
+
+class DispatchError(Exception):
+    """A step failed. retry=False when trying again can't help (e.g. no lp installed)."""
+
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        self.retry = retry
+
+class StepSkipped(Exception):
+    """A step that doesn't apply here, e.g. opening a viewer without a display."""
+
+class OpenViewer:
+    """Opens the file in the desktop's default viewer, without waiting for it."""
+    name = 'open'
+    retries = 0  # Retrying a viewer only opens it twice
+
+    def run(self, path):
+        if sys.platform == 'win32':
+            os.startfile(path)
+            return
+        if sys.platform == 'darwin':
+            command = 'open'
+        else:
+            if not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+                raise StepSkipped("no display")
+            command = 'xdg-open'
+        if shutil.which(command) is None:
+            raise DispatchError(f"'{command}' not found; open {path} manually", retry=False)
+        subprocess.Popen([command, path], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+
+class PrintToQueue:
+    """Sends the file to a CUPS (or lpd) queue with lp; printer None uses the default queue."""
+    name = 'print'
+    retries = DISPATCH_RETRIES
+
+    def __init__(self, printer=None, copies=1, options=()):
+        self.printer = printer
+        self.copies = copies
+        self.options = options  # lp -o values, e.g. ('fit-to-page', 'media=Letter')
+
+    def run(self, path):
+        if shutil.which('lp') is None:
+            raise DispatchError("'lp' not found; install CUPS to print from JarLabeler", retry=False)
+        command = ['lp']
+        if self.printer:
+            command += ['-d', self.printer]
+        if self.copies > 1:
+            command += ['-n', str(self.copies)]
+        for option in self.options:
+            command += ['-o', option]
+        try:
+            result = subprocess.run(command + ['--', path], capture_output=True, text=True, timeout=LP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            raise DispatchError(f"lp did not answer within {LP_TIMEOUT}s")
+        if result.returncode != 0:
+            raise DispatchError((result.stderr or result.stdout).strip() or f"lp exited with {result.returncode}")
+        return result.stdout.strip()  # 'request id is ...'
+
+class ArchiveCopy:
+    """Keeps a dated copy of the file, e.g. output/archive/2024-05-01/093012-labels.pdf."""
+    name = 'archive'
+    retries = DISPATCH_RETRIES
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+
+    def run(self, path):
+        now = datetime.now()
+        folder = os.path.join(self.directory, now.strftime('%Y-%m-%d'))
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, f"{now.strftime('%H%M%S')}-{os.path.basename(path)}")
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+        return target
+
+class DispatchJob:
+    """A file and the steps to run on it, with each step's status: pending, running, retrying, done, skipped or failed."""
+
+    def __init__(self, job_id, path, steps, for_job=None):
+        self.id = job_id
+        self.path = path
+        self.steps = steps
+        self.for_job = for_job  # Id of the generation job (JobMetrics.id) that made the file
+        self.states = {step.name: {'status': 'pending', 'attempts': 0, 'error': None, 'result': None, 'seconds': 0.0}
+                       for step in steps}
+        self.finished = threading.Event()
+
+    @property
+    def status(self):
+        statuses = [state['status'] for state in self.states.values()]
+        if not self.finished.is_set():
+            return 'running' if any(status != 'pending' for status in statuses) else 'queued'
+        return 'failed' if 'failed' in statuses else 'done'
+
+    def errors(self):
+        return [f"{name}: {state['error']}" for name, state in self.states.items() if state['status'] == 'failed']
+
+class Dispatcher:
+    """Runs post-generation steps (open, print, archive) on finished files in a background thread.
+
+    submit() returns at once. Jobs run one after another, in order. Within
+    a job every step runs, even if an earlier one failed. A failed step is
+    retried after RETRY_DELAY, then twice that, up to its retries. on_update
+    (job) is called from the dispatch thread whenever a step changes state.
+    In a Tk app, pass it to the main thread through a Queue, as generation
+    progress is. With a metrics_path, each finished job appends a 'dispatch'
+    record there: every step's time (attempts, not the waits between them)
+    as a phase, and its status, attempts and error."""
+
+    def __init__(self, on_update=None, retry_delay=RETRY_DELAY, metrics_path=None):
+        self.on_update = on_update
+        self.retry_delay = retry_delay
+        self.metrics_path = metrics_path
+        self.jobs = []
+        self._ids = itertools.count(1)
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, path, steps, for_job=None):
+        job = DispatchJob(next(self._ids), os.path.abspath(path), list(steps), for_job)
+        self.jobs.append(job)
+        if not job.steps:
+            job.finished.set()
+            return job
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dispatch', daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def wait(self, timeout=None):
+        """Blocks until every submitted job has finished (for the command line, before exiting)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in list(self.jobs):
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not job.finished.wait(remaining):
+                return False
+        return True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            metrics = JobMetrics('dispatch', DISPATCH_PHASES)
+            for step in job.steps:
+                self._run_step(job, step)
+                metrics.add(step.name, job.states[step.name]['seconds'])
+            if self.metrics_path:
+                metrics.finish(for_job=job.for_job, output=job.path,
+                               steps={name: {key: state[key] for key in ('status', 'attempts', 'error')}
+                                      for name, state in job.states.items()})
+                try:
+                    metrics.write(self.metrics_path)
+                except OSError as e:
+                    print(f"Could not write dispatch metrics: {e}")
+            job.finished.set()
+            self._notify(job)
+
+    def _run_step(self, job, step):
+        state = job.states[step.name]
+        delay = self.retry_delay
+        while True:
+            state['attempts'] += 1
+            state['status'] = 'running'
+            self._notify(job)
+            started = time.perf_counter()
+            try:
+                state['result'] = step.run(job.path)
+                error = None
+            except Exception as e:
+                error = e
+            state['seconds'] += time.perf_counter() - started
+            state['error'] = None if error is None else str(error)
+            if error is None:
+                state['status'] = 'done'
+                return
+            if isinstance(error, StepSkipped):
+                state['status'] = 'skipped'
+                return
+            if not getattr(error, 'retry', True) or state['attempts'] > step.retries:
+                state['status'] = 'failed'
+                print(f"Dispatch {step.name} failed for {job.path}: {error}")
+                return
+            state['status'] = 'retrying'
+            self._notify(job)
+            time.sleep(delay)
+            delay *= 2
+
+    def _notify(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                print(f"Dispatch update error: {e}")
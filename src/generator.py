@@ -1,258 +1,346 @@
 import os
-import subprocess  # For improved PDF opening
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.colors import black
-from reportlab.lib.utils import ImageReader  # For accurate logo sizing
-from models import Strain
-from tkinter import messagebox
-import json  # For parsing prices
+import math
+import time
+import itertools
+from models import Strain, QueueItem
+from assets import LogoCache
+from layout import LabelTemplate, pricetag_key
+from metrics import JobMetrics, METRICS_PATH
+from stock import STOCKS, DEFAULT_STOCK
+from render_cache import RenderCache
+
+DEFAULT_PDF_PATH = os.path.join('output', 'labels.pdf')
+STREAM_PAGES_PER_CHUNK = 100  # Pages rendered in memory at a time by generate_pdf_stream
+
+class GenerationCancelled(Exception):
+    pass
+
+def _canvas_module():
+    # reportlab (and PIL with it) is only loaded once a job needs it, not at app startup
+    from reportlab import rl_config
+    from reportlab.pdfgen import canvas
+    # Write binary (Flate only) streams. ASCII85 text-encoding adds ~25% to the file and, without
+    # the optional C accelerator, is the slowest step of embedding logos in every chunk/shard.
+    rl_config.useA85 = 0
+    return canvas
+
+def draw_ops(pdf, ops, x, y, record=None):
+    # Replays layout ops (see LabelTemplate) with their origin at (x, y). Given a record list, text is drawn
+    # as text objects and what was drawn is appended to it as ops for draw_recorded()
+    font = None
+    fill = None
+    for op in ops:
+        kind = op[0]
+        if kind == 'text':
+            _, font_name, size, ox, oy, text, color, align = op
+            if font != (font_name, size):
+                pdf.setFont(font_name, size)
+                font = (font_name, size)
+                if record is not None:
+                    record.append(('font', font_name, size))
+            if fill != color:
+                pdf.setFillColorRGB(*(color or (0, 0, 0)))
+                fill = color
+                if record is not None:
+                    record.append(('fill', color or (0, 0, 0)))
+            if record is not None:
+                if align == 'centre':
+                    from reportlab.pdfbase.pdfmetrics import stringWidth
+                    ox -= stringWidth(text, font_name, size) / 2
+                # What drawString() does, keeping the text object's code
+                text_object = pdf.beginText(x + ox, y + oy)
+                text_object.textLine(text)
+                code = text_object.getCode()
+                pdf.addLiteral(code)
+                record.append(('code', code))
+            elif align == 'centre':
+                pdf.drawCentredString(x + ox, y + oy, text)
+            else:
+                pdf.drawString(x + ox, y + oy, text)
+        elif kind == 'line':
+            _, x1, y1, x2, y2, line_width = op
+            pdf.setLineWidth(line_width)
+            pdf.line(x + x1, y + y1, x + x2, y + y2)
+            pdf.setLineWidth(1)
+            if record is not None:
+                record.append(op)
+        elif kind == 'image':
+            _, path, ox, oy, w, h = op
+            pdf.drawImage(path, x + ox, y + oy, w, h, mask='auto')
+    if fill is not None:
+        pdf.setFillColorRGB(0, 0, 0)
+        if record is not None:
+            record.append(('fill', (0, 0, 0)))
+
+_translations = {}  # (x, y) -> 'q ... cm'; labels sit at a handful of positions, and formatting numbers is slow
+
+def _translation(x, y):
+    translation = _translations.get((x, y))
+    if translation is None:
+        from reportlab.lib.rl_accel import fp_str
+        translation = _translations[(x, y)] = f"q 1 0 0 1 {fp_str(x, y)} cm"
+    return translation
+
+def draw_ops_recorded(pdf, ops, x, y):
+    """draw_ops() for a nametag, also returning what it drew as a render cache entry.
+
+    The ops are drawn translated to (x, y), so the entry is relative to the
+    label and draw_recorded() can replay it anywhere. An entry is the logo's
+    position (the image itself is drawn live) and ops for everything else,
+    with each line of text as the PDF code of its text object: drawing the
+    text is most of the cost of a nametag. Fonts stay setFont() calls, so
+    each PDF names them its own way. The translation is written as plain
+    q/cm/Q operators; draw_ops() leaves colors and line width as it found
+    them, and saveState() and restoreState() would cost as much as
+    replaying the label."""
+    pdf.addLiteral(_translation(x, y))
+    image = None
+    if ops and ops[0][0] == 'image':
+        draw_ops(pdf, ops[:1], 0, 0)
+        image = ops[0][2:4]
+        ops = ops[1:]
+    record = []
+    draw_ops(pdf, ops, 0, 0, record)
+    pdf.addLiteral('Q')
+    return image, record
+
+def draw_recorded(pdf, entry, logo, x, y):
+    # Replays a draw_ops_recorded() entry at (x, y); the logo is drawn live so it is shared like any other
+    image, ops = entry
+    pdf.addLiteral(_translation(x, y))
+    if image:
+        pdf.drawImage(logo.path, image[0], image[1], logo.width, logo.height, mask='auto')
+    for op in ops:
+        kind = op[0]
+        if kind == 'code':
+            pdf.addLiteral(op[1])
+        elif kind == 'font':
+            pdf.setFont(op[1], op[2])
+        elif kind == 'fill':
+            pdf.setFillColorRGB(*op[1])
+        elif kind == 'line':
+            _, x1, y1, x2, y2, line_width = op
+            pdf.setLineWidth(line_width)
+            pdf.line(x1, y1, x2, y2)
+            pdf.setLineWidth(1)
+    pdf.addLiteral('Q')
 
 class LabelGenerator:
-    def __init__(self, db_conn):
+    def __init__(self, db_conn, metrics_path=METRICS_PATH, stock=None):
         self.db_conn = db_conn
-        self.queue = []  # List of dicts: {'strain': Strain, 'brand': dict, 'tier': dict}
+        self.metrics_path = metrics_path  # Each job appends a JSONL record here (None to skip)
+        self.queue = []  # QueueItems
+        self._ids = itertools.count(1)  # Stable ids so views can track items across deletes
+        self.logos = LogoCache()  # Decoded/scaled logos survive across jobs
+        self.render_cache = RenderCache()  # Unchanged nametags are reused across runs (None to always render)
+        self.set_stock(stock or STOCKS[DEFAULT_STOCK])
+
+    def set_stock(self, stock):
+        # Sheet layout (see stock.py); the label template is compiled for its label size
+        self.stock = stock
+        self.template = LabelTemplate(stock.label_width, stock.label_height)  # Items only bind their fields
 
     def add_to_queue(self, strain, brand, tier):
-        self.queue.append({'strain': strain, 'brand': brand, 'tier': tier})
+        item = QueueItem(next(self._ids), strain, brand, tier)
+        self.queue.append(item)
+        return item
 
     def remove_from_queue(self, index):
         if 0 <= index < len(self.queue):
             del self.queue[index]
 
+    def remove_items(self, ids):
+        # Bulk delete by item id in one pass
+        ids = set(ids)
+        self.queue[:] = [item for item in self.queue if item.id not in ids]
+
+    def _tier_logo(self, tier):
+        logo_path = tier.get('nametag_logo_path')
+        if not logo_path:
+            return None
+        try:
+            return self.logos.get(logo_path, self.template.max_logo_width, self.template.max_logo_height)
+        except Exception as e:
+            print(f"Tier logo error: {e}")
+            return None
+
+    def _pricetag_form(self, pdf, forms, brand, tier):
+        key = pricetag_key(brand, tier)
+        form_name = forms.get(key)
+        if form_name is None:
+            form_name = f"pricetag{len(forms)}"
+            w = self.template.label_width
+            h = self.template.label_height
+            # Loose bounding box so over-long brand names are not clipped
+            pdf.beginForm(form_name, lowerx=0, lowery=-2 * h, upperx=3 * w, uppery=h)
+            draw_ops(pdf, self.template.pricetag_ops(brand, tier), 0, 0)
+            pdf.endForm()
+            forms[key] = form_name
+        return form_name
+
     def get_queue_summary(self):
-        return [f"{item['brand']['category']} - {item['brand']['name']} - {item['tier']['name']} - Strain: {item['strain'].name} ({item['strain'].classification}, THC {item['strain'].thc_percent}%, Lineage: {item['strain'].lineage or 'None'})" for item in self.queue]
+        return [f"{item.brand['category']} - {item.brand['name']} - {item.tier['name']} - Strain: {item.strain.name} ({item.strain.classification}, THC {item.strain.thc_percent}%, Lineage: {item.strain.lineage or 'None'})" for item in self.queue]
+
+    def snapshot(self):
+        # Copy of the queue for a background job; the UI may keep adding to self.queue meanwhile
+        return list(self.queue)
+
+    def generate_pdf(self, pdf_path=DEFAULT_PDF_PATH, workers=1, items=None, progress=None, cancel=None, metrics=None):
+        """Renders items (default: the queue) to pdf_path.
 
-    def generate_pdf(self):
-        if not self.queue:
+        progress(pages_done, total_pages) is called after each page and a set
+        cancel Event raises GenerationCancelled before anything is written;
+        both apply to serial runs. Phase timings go into metrics if given
+        (the caller writes it), otherwise into a record appended to
+        self.metrics_path."""
+        items = self.queue if items is None else items
+        if not items:
             raise ValueError("Queue is empty. Add pairs first.")
-        
-        # Configurable variables for easy formatting/spacing adjustments
-        nametag_font_sizes = {
-            'tier': 16,      # Tier name size
-            'strain': 20,    # Strain name size (bold, underlined)
-            'lineage': 12,   # Lineage size
-            'class': 12,     # Classification size
-            'thc': 12        # THC% size
-        }
-        pricetag_font_sizes = {
-            'brand': 20,     # Brand name size (underlined)
-            'tier': 18,      # Tier name size (underlined)
-            'prices': 20     # Price lines size
-        }
-        line_spacing_extra = 0.04 * inch  # Extra vertical space between nametag lines (adjust to tighten/loosen)
-        gap_after_logo = 0.015 * inch       # Gap below logo before text starts (adjust for more/less breathing room)
-        price_line_extra = 0.06 * inch    # Extra vertical padding per pricetag line
-        no_logo_top_margin = 0.1 * inch   # Top margin if no logo (adjust to reduce empty space at top)
-        underline_offset = 0.035 * inch    # Vertical offset for underlines (adjust if lines overlap text)
-        gap_after_tier_price = 0.08 * inch  # Extra gap after tier name before pricing in pricetag (adjust to increase/decrease specific space)
-        
-        os.makedirs('output', exist_ok=True)
-        pdf_path = os.path.join('output', 'labels.pdf')
-        pdf = canvas.Canvas(pdf_path, pagesize=letter)
-        width, height = letter
-        margin = 0.5 * inch
-        label_width = 3.5 * inch
-        label_height = 2.25 * inch
-        pairs_per_page = 4
-        x_left = margin
-        y_start = height - margin
-        for i, item in enumerate(self.queue):
-            if i > 0 and i % pairs_per_page == 0:
-                pdf.showPage()
-                y = height - margin
+        job_metrics = metrics or JobMetrics()
+        if workers != 1:
+            from parallel import generate_pdf_parallel  # Process pool only for big runs (None = one per CPU)
+            generate_pdf_parallel(items, pdf_path, workers, metrics=job_metrics, stock=self.stock)
+        else:
+            if os.path.dirname(pdf_path):
+                os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+            if self.render_cache is not None:
+                self._render_cached(items, pdf_path, progress, cancel, job_metrics)
             else:
-                y = y_start - (i % pairs_per_page) * label_height * 1.05
-            brand = item['brand']
-            tier = item['tier']
-            strain = item['strain']
-            # Nametag
-            center_x = x_left + label_width / 2
-            y_top = y - 0.1 * inch
-            # Prepare text elements
-            # Determine tier color for medical labels
-            tier_color = black
-            if brand.get('category') == 'MED':
-                color_map = {
-                    'Green Tier': (0, 0.5, 0),
-                    'Red Tier': (1, 0, 0),
-                    'Yellow Tier': (1, 0.8, 0),
-                    'Orange Tier': (1, 0.65, 0),
-                    'Pink Tier': (1, 0.08, 0.58),
-                    'Purple Tier': (0.5, 0, 0.5),
-                }
-                tier_color = color_map.get(tier.get('name'), black)
-            text_elements = [
-                ("Helvetica-Bold", nametag_font_sizes['tier'], tier['name'], False, tier_color),
-                ("Helvetica-BoldOblique", nametag_font_sizes['strain'], strain.name, True), # underline
-            ]
-            if strain.lineage:
-                text_elements.append(("Helvetica", nametag_font_sizes['lineage'], f"({strain.lineage})"))
-            text_elements.append(("Helvetica", nametag_font_sizes['class'], strain.classification))
-            text_elements.append(("Helvetica-Bold", nametag_font_sizes['thc'], f"THC: {strain.thc_percent:.2f}%"))
-            # Estimate total text height
-            total_text_height = 0
-            for font, size, *_ in text_elements:
-                pdf.setFont(font, size)
-                total_text_height += pdf._leading + line_spacing_extra
-            # Set max logo height so logo + text fits label
-            available_height = label_height - 0.1 * inch
-            max_logo_height = available_height * 0.45
-            max_logo_width = label_width * .7
-            logo_height_used = 0 
-            elements = []  # List of (type, height, data)
-            logo_path = tier.get('nametag_logo_path')
-            if logo_path:
-                abs_logo_path = os.path.abspath(logo_path)
-                if os.path.exists(abs_logo_path):
-                    try:
-                        logo_img = ImageReader(abs_logo_path)
-                        img_w, img_h = logo_img.getSize()
-                        aspect = img_w / img_h
-                        logo_width = min(max_logo_width, max_logo_height * aspect)
-                        logo_height = logo_width / aspect if aspect > 1 else min(max_logo_height, max_logo_width / aspect)
-                        elements.append(('logo', logo_height, (logo_img, logo_width)))
-                        logo_height_used = logo_height
-                    except Exception as e:
-                        print(f"Tier logo error: {e}")
-            # Add text elements with their heights
-            for font, size, text, *extra in text_elements:
-                pdf.setFont(font, size)
-                elements.append(('text', pdf._leading, (font, size, text, extra)))
-            # Calculate even spacing
-            total_content_height = sum(h for _, h, _ in elements)
-            num_gaps = len(elements) - 1 if elements else 0
-            gap_size = (available_height - total_content_height) / (num_gaps + 1) if num_gaps > 0 else 0  # Extra gaps at top/bottom
+                self._render(items, pdf_path, progress, cancel, job_metrics)
+        self._finish_job(job_metrics, metrics is None, pdf_path, len(items), workers=workers or os.cpu_count(), stock=self.stock.name)
+        return pdf_path
 
-            if not logo_path:
-                y_current = y_top - no_logo_top_margin
-            else:
-                y_current = y_top - gap_size
+    def generate(self, output, backend=None, items=None, **options):
+        """Renders items (default: the queue) through an output backend from backends.py; PDF unless given."""
+        from backends import PdfBackend
+        return (backend or PdfBackend()).write(self, self.queue if items is None else items, output, **options)
 
-            for el_type, el_height, el_data in elements:
-                if el_type == 'logo':
-                    img, width = el_data
-                    logo_x = center_x - width / 2
-                    pdf.drawImage(img, logo_x, y_current - el_height, width, el_height, mask='auto')
-                else:
-                    font, size, text = el_data[:3]
-                    underline = el_data[3][0] if el_data[3] else False
-                    color = el_data[3][1] if len(el_data[3]) > 1 else black
-                    pdf.setFont(font, size)
-                    if color != black:
-                        pdf.setFillColorRGB(*color)
-                    pdf.drawCentredString(center_x, y_current - size, text)  # Align baseline to y_current - size for better positioning
-                    pdf.setFillColor(black)
-                    if underline:
-                        pdf.setLineWidth(2)
-                        text_width = pdf.stringWidth(text)
-                        underline_y = (y_current - size) - underline_offset
-                        pdf.line(center_x - text_width / 2, underline_y, center_x + text_width / 2, underline_y)
-                        pdf.setLineWidth(1)
-                y_current -= el_height + (gap_after_logo if el_type == 'logo' else gap_size)
-            # If no logo, adjust starting y if needed
-            if not logo_path:
-                y_current = y_top - no_logo_top_margin
-            prices = tier.get('prices', {})
-            def format_price(weight, price):
-                if price:
-                    return f"{weight}-${price}"
-                return ''
-            # Pricetag: evenly distribute elements to fill right half
-            p_center_x = x_left + label_width + label_width / 2
-            p_top = y - 0.4 * inch
-            p_bottom = y - label_height + 0.1 * inch
-            # Collect non-empty price lines to avoid wasting space on blanks
-            price_lines = [
-                ("Helvetica-Bold", pricetag_font_sizes['brand'], brand['name'].upper(), True),
-                ("Helvetica-Bold", pricetag_font_sizes['tier'], tier['name'].upper(), True),
-            ]
-            if brand.get('category') == 'MED':
-                p1 = format_price('1g', prices.get('1g'))
-                p2 = format_price('3.5g', prices.get('3.5g'))
-                p3 = format_price('7g', prices.get('7g'))
-                p4 = format_price('14g', prices.get('14g'))
-                p5 = format_price('28g', prices.get('28g'))
-                p6 = format_price('1lb', prices.get('1lb'))
-                if p1 or p2:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], (p1, p2)))
-                if p3 or p4:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], (p3, p4)))
-                if p5 or p6:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], (p5, p6)))
+    def generate_pdf_stream(self, items, pdf_path=DEFAULT_PDF_PATH, pages_per_chunk=STREAM_PAGES_PER_CHUNK, metrics=None, on_chunk=None):
+        """Renders any iterable of (strain, brand, tier) without holding it in memory.
+
+        Every pages_per_chunk pages are rendered and flushed to pdf_path before
+        more items are read, so peak memory does not grow with the input.
+        on_chunk(items) is called with each chunk's QueueItems once they are
+        in the PDF (e.g. to record them). Returns the number of label pairs
+        written."""
+        if os.path.dirname(pdf_path):
+            os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+        from pdfmerge import PdfConcatenator
+        chunk_size = pages_per_chunk * self.stock.pairs_per_page
+        part_path = f"{pdf_path}.{os.getpid()}.chunk"
+        merger = PdfConcatenator(pdf_path)
+        job_metrics = metrics or JobMetrics('stream')
+        count = 0
+
+        def flush(chunk):
+            self._render(chunk, part_path, metrics=job_metrics)
+            with job_metrics.phase('merge'):
+                merger.append(part_path)
+            if on_chunk:
+                on_chunk(chunk)
+            return len(chunk)
+
+        try:
+            chunk = []
+            for strain, brand, tier in items:
+                chunk.append(QueueItem(None, strain, brand, tier))
+                if len(chunk) == chunk_size:
+                    count += flush(chunk)
+                    chunk = []
+            if chunk:
+                count += flush(chunk)
+            if not count:
+                raise ValueError("No labels to generate.")
+            with job_metrics.phase('merge'):
+                merger.close()
+        except BaseException:
+            merger.abort()
+            raise
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        self._finish_job(job_metrics, metrics is None, pdf_path, count, pages_per_chunk=pages_per_chunk, stock=self.stock.name)
+        return count
+
+    def _finish_job(self, metrics, write, pdf_path, pairs, **info):
+        metrics.finish(pairs=pairs, output=pdf_path, pdf_bytes=os.path.getsize(pdf_path), **info)
+        if write and self.metrics_path:
+            metrics.write(self.metrics_path)
+
+    def _render_cached(self, items, pdf_path, progress, cancel, metrics):
+        # Nametags found in the render cache are replayed rather than laid out and drawn; new ones are cached
+        cache = self.render_cache
+        with metrics.phase('cache'):
+            keys = cache.label_keys(items, self.template)
+            found, stale = cache.load(keys)
+        hits = sum(1 for key in keys if key in found)
+        new = {}
+        self._render(items, pdf_path, progress, cancel, metrics, (keys, found, new))
+        with metrics.phase('cache'):
+            cache.save(new, stale)
+        metrics.count('cached_labels', hits)
+
+    def _render(self, items, pdf_path, progress=None, cancel=None, metrics=None, cached=None):
+        # cached is (render cache key per item, entries by key, dict for new entries) from _render_cached
+        if metrics is None:
+            metrics = JobMetrics()
+        clock = time.perf_counter
+        decode = layout = draw = 0.0
+        decodes = self.logos.decodes
+        stock = self.stock
+        pdf = _canvas_module().Canvas(pdf_path, pagesize=stock.page_size)
+        self.logos.begin_job()
+        template = self.template
+        pairs_per_page = stock.pairs_per_page
+        pair_slots = stock.pair_slots  # Every label position on a page, computed once per stock
+        pricetag_shift = template.label_width  # Pricetag ops are laid out one label to the right of the pair origin
+        pricetag_forms = {}  # pricetag_key -> form name, each distinct pricetag is drawn once per PDF
+        total_pages = math.ceil(len(items) / pairs_per_page)
+        keys, found, new = cached or (None, None, None)
+        for i, item in enumerate(items):
+            started = clock()
+            if i > 0 and i % pairs_per_page == 0:
+                self._page_done(i // pairs_per_page, total_pages, progress, cancel)
+                pdf.showPage()
+            (x, y), (price_x, price_y) = pair_slots[i % pairs_per_page]
+            brand = item.brand
+            tier = item.tier
+            before_logo = clock()
+            logo = self._tier_logo(tier)
+            after_logo = clock()
+            entry = found.get(keys[i]) if cached else None
+            if entry is not None and (entry[0] is None) == (logo is None):  # Unless the logo has since failed to load, or loaded again
+                after_layout = after_logo
+                draw_recorded(pdf, entry, logo, x, y)
             else:
-                line1 = '   '.join(filter(None, [format_price('1g', prices.get('1g')), format_price('3.5g', prices.get('3.5g'))]))
-                if line1:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], line1))
-                line2 = '   '.join(filter(None, [format_price('7g', prices.get('7g')), format_price('14g', prices.get('14g'))]))
-                if line2:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], line2))
-                line3 = format_price('28g', prices.get('28g'))
-                if line3:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], line3))
-                line4 = format_price('1lb', prices.get('1lb'))
-                if line4:
-                    price_lines.append(("Helvetica-Bold", pricetag_font_sizes['prices'], line4))
-            # Calculate total height for pricetag
-            total_price_height = 0
-            for font, size, *_ in price_lines:
-                pdf.setFont(font, size)
-                total_price_height += pdf._leading + price_line_extra
-            # Evenly space pricetag elements
-            price_gap = (p_top - p_bottom - total_price_height) / (len(price_lines) + 1) if len(price_lines) > 0 else 0
-            p_y_current = p_top - price_gap
-            col_width = 1.4 * inch  # Adjust as needed for column spacing
-            pricetag_left = x_left + label_width + 0.3 * inch  # Left margin for pricetag
-            left_x = pricetag_left
-            right_x = pricetag_left + col_width
-            # Calculate fixed offset for price alignment in MED
-            global_offset = 0
-            max_right_width = 0
-            if brand.get('category') == 'MED':
-                price_tuples = [text for font, size, text, *_ in price_lines if isinstance(text, tuple)]
-                if price_tuples:
-                    pdf.setFont("Helvetica-Bold", pricetag_font_sizes['prices'])
-                    max_left_width = max(pdf.stringWidth(left) for left, _ in price_tuples)
-                    max_right_width = max(pdf.stringWidth(right) for _, right in price_tuples)
-                    effective_width = max(col_width + max_right_width, max_left_width)
-                    global_offset = p_center_x - left_x - (effective_width / 2)
-            for elem in price_lines:
-                font, size, text = elem[:3]
-                underline = elem[3] if len(elem) > 3 else False
-                pdf.setFont(font, size)
-                # Color tier name in pricetag if medical
-                if font == "Helvetica-Bold" and size == pricetag_font_sizes['tier'] and not isinstance(text, tuple) and text == tier['name'].upper():
-                    if tier_color != black:
-                        pdf.setFillColorRGB(*tier_color)
-                    else:
-                        pdf.setFillColor(black)
-                    is_tier = True
+                ops = template.nametag_ops(item.strain, brand, tier, logo)
+                after_layout = clock()
+                if cached:
+                    found[keys[i]] = new[keys[i]] = draw_ops_recorded(pdf, ops, x, y)  # Repeats in this job hit too
                 else:
-                    pdf.setFillColor(black)
-                    is_tier = False
-                if isinstance(text, tuple):
-                    left_text, right_text = text
-                    pdf.drawString(left_x + global_offset, p_y_current, left_text)
-                    right_width = pdf.stringWidth(right_text)
-                    pdf.drawString((right_x + global_offset + max_right_width) - right_width, p_y_current, right_text)
-                else:
-                    pdf.drawCentredString(p_center_x, p_y_current, text)
-                pdf.setFillColor(black)
-                if underline and text and not isinstance(text, tuple):
-                    pdf.setLineWidth(2)
-                    text_width = pdf.stringWidth(text)
-                    underline_y = p_y_current - underline_offset
-                    pdf.line(p_center_x - text_width / 2, underline_y, p_center_x + text_width / 2, underline_y)
-                    pdf.setLineWidth(1)
-                p_y_current -= pdf._leading + price_line_extra + (gap_after_tier_price if is_tier else price_gap)
-        pdf.save()
-        abs_path = os.path.abspath(pdf_path)
-        try:
-            if os.name == 'posix':
-                subprocess.call(['open', abs_path])
-            elif os.name == 'nt':
-                subprocess.call(['start', abs_path], shell=True)
-        except Exception as e:
-            messagebox.showerror("Open Failed", f"PDF at {abs_path}; error: {e}. Open manually.")
-        return pdf_path
\ No newline at end of file
+                    draw_ops(pdf, ops, x, y)
+            form_name = self._pricetag_form(pdf, pricetag_forms, brand, tier)
+            pdf.saveState()
+            pdf.translate(price_x - pricetag_shift, price_y)
+            pdf.doForm(form_name)
+            pdf.restoreState()
+            done = clock()
+            decode += after_logo - before_logo
+            layout += after_layout - after_logo
+            draw += (before_logo - started) + (done - after_layout)
+            metrics.label(item.strain.name, done - started)
+        self._page_done(total_pages, total_pages, progress, cancel)
+        with metrics.phase('save'):
+            pdf.save()
+        metrics.add('decode', decode)
+        metrics.add('layout', layout)
+        metrics.add('draw', draw)
+        metrics.count('pages', total_pages)
+        metrics.count('pricetag_forms', len(pricetag_forms))
+        metrics.count('logo_decodes', self.logos.decodes - decodes)
+
+    def _page_done(self, pages_done, total_pages, progress, cancel):
+        if cancel is not None and cancel.is_set():
+            raise GenerationCancelled()
+        if progress:
+            progress(pages_done, total_pages)
\ No newline at end of file
@@ -0,0 +1,196 @@
+from reportlab.lib.units import inch
+from models import PRICE_WEIGHTS
+from textfit import FITTER
+
+# Configurable variables for easy formatting/spacing adjustments
+NAMETAG_FONT_SIZES = {
+    'tier': 16,      # Tier name size
+    'strain': 20,    # Strain name size (bold, underlined)
+    'lineage': 12,   # Lineage size
+    'class': 12,     # Classification size
+    'thc': 12        # THC% size
+}
+PRICETAG_FONT_SIZES = {
+    'brand': 20,     # Brand name size (underlined)
+    'tier': 18,      # Tier name size (underlined)
+    'prices': 20     # Price lines size
+}
+LINE_SPACING_EXTRA = 0.04 * inch     # Extra vertical space between nametag lines (adjust to tighten/loosen)
+GAP_AFTER_LOGO = 0.015 * inch        # Gap below logo before text starts (adjust for more/less breathing room)
+PRICE_LINE_EXTRA = 0.06 * inch       # Extra vertical padding per pricetag line
+NO_LOGO_TOP_MARGIN = 0.1 * inch      # Top margin if no logo (adjust to reduce empty space at top)
+UNDERLINE_OFFSET = 0.035 * inch      # Vertical offset for underlines (adjust if lines overlap text)
+GAP_AFTER_TIER_PRICE = 0.08 * inch   # Extra gap after tier name before pricing in pricetag (adjust to increase/decrease specific space)
+PRICE_COL_WIDTH = 1.4 * inch         # Column spacing for MED two-column prices
+TEXT_PADDING = 0.1 * inch            # Clear space each side of a text line; longer lines shrink or wrap (see textfit.py)
+LEADING = 1.2                        # Line height as a multiple of font size (reportlab's default)
+DESIGN_SIZE = (3.5 * inch, 2.25 * inch)  # Label size the values above are tuned for; other sizes scale them
+TEMPLATE_VERSION = 2  # Bump whenever the ops below would draw differently, so cached nametags are laid out again
+
+# Tier colors for medical labels; anything else prints black
+TIER_COLORS = {
+    'Green Tier': (0, 0.5, 0),
+    'Red Tier': (1, 0, 0),
+    'Yellow Tier': (1, 0.8, 0),
+    'Orange Tier': (1, 0.65, 0),
+    'Pink Tier': (1, 0.08, 0.58),
+    'Purple Tier': (0.5, 0, 0.5),
+}
+
+def format_price(weight, price):
+    if price:
+        return f"{weight}-${price}"
+    return ''
+
+def tier_color(brand, tier):
+    # None means plain black
+    if brand.get('category') == 'MED':
+        return TIER_COLORS.get(tier.get('name'))
+    return None
+
+def pricetag_key(brand, tier):
+    # Everything a pricetag depends on; equal keys render identical tags
+    prices = tier.get('prices', {})
+    return (brand['name'], brand.get('category'), tier['name'], tuple(prices.get(weight) or '' for weight in PRICE_WEIGHTS))
+
+class LabelTemplate:
+    """Nametag/pricetag layout compiled once per generator.
+
+    Everything that does not depend on the queue item (fonts, line heights,
+    logo box, pricetag geometry) is worked out here. nametag_ops() and
+    pricetag_ops() then only bind strain/tier fields and return draw ops
+    relative to the top-left corner of the label pair:
+
+        ('image', path, x, y, width, height)
+        ('text', font, size, x, y, text, color, align)   # align is 'centre' or 'left'
+        ('line', x1, y1, x2, y2, line_width)
+
+    The pricetag sits one label_width to the right of the nametag. Labels
+    smaller or larger than DESIGN_SIZE get every font size and spacing
+    scaled by the same factor, so the design keeps its proportions. Text
+    too wide for the label (less TEXT_PADDING each side) is shrunk, then
+    wrapped onto two lines.
+    """
+
+    def __init__(self, label_width=3.5 * inch, label_height=2.25 * inch):
+        self.label_width = label_width
+        self.label_height = label_height
+        scale = self.scale = min(label_width / DESIGN_SIZE[0], label_height / DESIGN_SIZE[1])
+        self.no_logo_top_margin = NO_LOGO_TOP_MARGIN * scale
+        self.gap_after_logo = GAP_AFTER_LOGO * scale
+        self.underline_offset = UNDERLINE_OFFSET * scale
+        self.gap_after_tier_price = GAP_AFTER_TIER_PRICE * scale
+        self.price_col_width = PRICE_COL_WIDTH * scale
+        self.rule_width = 2 * scale
+        self.text_width = label_width - 2 * TEXT_PADDING * scale
+        # Nametag geometry
+        self.center_x = label_width / 2
+        self.y_top = -0.1 * inch * scale
+        self.available_height = label_height - 0.1 * inch * scale
+        self.max_logo_height = self.available_height * 0.45  # Logo + text must fit label
+        self.max_logo_width = label_width * .7
+        sizes = {key: size * scale for key, size in NAMETAG_FONT_SIZES.items()}
+        self.tier_line = ("Helvetica-Bold", sizes['tier'], sizes['tier'] * LEADING)
+        self.strain_line = ("Helvetica-BoldOblique", sizes['strain'], sizes['strain'] * LEADING)
+        self.lineage_line = ("Helvetica", sizes['lineage'], sizes['lineage'] * LEADING)
+        self.class_line = ("Helvetica", sizes['class'], sizes['class'] * LEADING)
+        self.thc_line = ("Helvetica-Bold", sizes['thc'], sizes['thc'] * LEADING)
+        self.text_height = sum(line[2] for line in (self.tier_line, self.strain_line, self.class_line, self.thc_line))
+        # Pricetag geometry
+        self.p_center_x = label_width + label_width / 2
+        self.p_top = -0.4 * inch * scale
+        self.p_bottom = -label_height + 0.1 * inch * scale
+        self.pricetag_left = label_width + 0.3 * inch * scale  # Left margin for pricetag
+        sizes = {key: size * scale for key, size in PRICETAG_FONT_SIZES.items()}
+        line_extra = PRICE_LINE_EXTRA * scale
+        self.brand_line = ("Helvetica-Bold", sizes['brand'], sizes['brand'] * LEADING + line_extra)
+        self.price_tier_line = ("Helvetica-Bold", sizes['tier'], sizes['tier'] * LEADING + line_extra)
+        self.price_line = ("Helvetica-Bold", sizes['prices'], sizes['prices'] * LEADING + line_extra)
+
+    def nametag_ops(self, strain, brand, tier, logo=None):
+        from reportlab.pdfbase.pdfmetrics import stringWidth  # Loaded with the first job, not at startup
+        color = tier_color(brand, tier)
+        lines = [(self.tier_line, tier['name'], color, False), (self.strain_line, strain.name, None, True)]
+        if strain.lineage:
+            lines.append((self.lineage_line, f"({strain.lineage})", None, False))
+        lines.append((self.class_line, strain.classification, None, False))
+        lines.append((self.thc_line, f"THC: {strain.thc_percent:.2f}%", None, False))
+        lines = [self._fit(line, text) + (line_color, underline) for line, text, line_color, underline in lines]
+        content_height = sum(height * len(texts) for _, _, height, texts, _, _ in lines)
+        num_elements = len(lines)
+        if logo:
+            content_height += logo.height
+            num_elements += 1
+        # Evenly spread the leftover height, including above the first and below the last element
+        gap_size = (self.available_height - content_height) / num_elements
+        if not tier.get('nametag_logo_path'):
+            y_current = self.y_top - self.no_logo_top_margin
+        else:
+            y_current = self.y_top - gap_size
+        ops = []
+        if logo:
+            ops.append(('image', logo.path, self.center_x - logo.width / 2, y_current - logo.height, logo.width, logo.height))
+            y_current -= logo.height + self.gap_after_logo
+        for font, size, height, texts, color, underline in lines:
+            for n, text in enumerate(texts):
+                baseline = y_current - size  # Align baseline to y_current - size for better positioning
+                ops.append(('text', font, size, self.center_x, baseline, text, color, 'centre'))
+                if underline:
+                    half_width = stringWidth(text, font, size) / 2
+                    underline_y = baseline - self.underline_offset
+                    ops.append(('line', self.center_x - half_width, underline_y, self.center_x + half_width, underline_y, self.rule_width))
+                y_current -= height + (gap_size if n == len(texts) - 1 else 0)
+        return ops
+
+    def _fit(self, line, text):
+        # (font, size, height, texts) with text fitted to the label; height is per wrapped line
+        font, size, height = line
+        fitted, texts = FITTER.fit(text, font, size, self.text_width)
+        if fitted != size:
+            height += (fitted - size) * LEADING
+        return font, fitted, height, texts
+
+    def pricetag_ops(self, brand, tier):
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        color = tier_color(brand, tier)
+        prices = tier.get('prices', {})
+        formatted = [format_price(weight, prices.get(weight)) for weight in PRICE_WEIGHTS]
+        # Collect non-empty price rows to avoid wasting space on blanks
+        if brand.get('category') == 'MED':
+            rows = [pair for pair in zip(formatted[0::2], formatted[1::2]) if pair[0] or pair[1]]
+        else:
+            rows = ['   '.join(filter(None, formatted[0:2])), '   '.join(filter(None, formatted[2:4])), formatted[4], formatted[5]]
+            rows = [row for row in rows if row]
+        headings = [self._fit(self.brand_line, brand['name'].upper()) + (None,),
+                    self._fit(self.price_tier_line, tier['name'].upper()) + (color,)]
+        total_height = sum(height * len(texts) for _, _, height, texts, _ in headings) + len(rows) * self.price_line[2]
+        price_gap = (self.p_top - self.p_bottom - total_height) / (len(rows) + 3)
+        y_current = self.p_top - price_gap
+        ops = []
+        for (font, size, height, texts, line_color), gap in zip(headings, (price_gap, self.gap_after_tier_price)):
+            for n, text in enumerate(texts):
+                ops.append(('text', font, size, self.p_center_x, y_current, text, line_color, 'centre'))
+                if text:
+                    half_width = stringWidth(text, font, size) / 2
+                    underline_y = y_current - self.underline_offset
+                    ops.append(('line', self.p_center_x - half_width, underline_y, self.p_center_x + half_width, underline_y, self.rule_width))
+                y_current -= height + (gap if n == len(texts) - 1 else 0)
+        font, size, height = self.price_line
+        if rows and isinstance(rows[0], tuple):
+            # Two columns: left prices share a start, right prices share an end, block centred on the tag
+            max_left_width = max(stringWidth(left, font, size) for left, _ in rows)
+            max_right_width = max(stringWidth(right, font, size) for _, right in rows)
+            effective_width = max(self.price_col_width + max_right_width, max_left_width)
+            left_x = self.p_center_x - effective_width / 2
+            right_end = left_x + self.price_col_width + max_right_width
+            for left_text, right_text in rows:
+                if left_text:
+                    ops.append(('text', font, size, left_x, y_current, left_text, None, 'left'))
+                if right_text:
+                    ops.append(('text', font, size, right_end - stringWidth(right_text, font, size), y_current, right_text, None, 'left'))
+                y_current -= height + price_gap
+        else:
+            for text in rows:
+                ops.append(('text', font, size, self.p_center_x, y_current, text, None, 'centre'))
+                y_current -= height + price_gap
+        return ops
@@ -3,10 +3,13 @@ import os
 # Add src/ to sys.path for relative imports to work when running directly
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-import tkinter as tk
-from ui import JarLabelerApp  # Your absolute import now works with path fix
-
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Command-line mode (e.g. `main.py generate strains.csv`) never touches Tk
+        from cli import main
+        sys.exit(main())
+    import tkinter as tk
+    from ui import JarLabelerApp  # Your absolute import now works with path fix
     root = tk.Tk()
     app = JarLabelerApp(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import time
+from database import parse_amount, set_tier_prices, delete_tier_prices
+
+class MenuDiff:
+    """What applying a menu feed would change: inserts, updates and deletes of brands, tiers and prices.
+
+    The feed is the source of truth for the categories it covers. Brands and
+    tiers not in it are deleted from those categories, and categories absent
+    from the feed are left alone. A logo or a tier's prices that a row leaves
+    blank are kept as they are. A row with any prices replaces the tier's
+    whole price list, so weights it omits are removed."""
+
+    def __init__(self):
+        self.new_brands = {}      # (name, category) -> logo_path
+        self.brand_logos = {}     # brand id -> new logo_path
+        self.new_tiers = {}       # (brand, category, tier) -> (nametag_logo_path, prices or None)
+        self.tier_logos = {}      # tier id -> new nametag_logo_path
+        self.tier_prices = {}     # tier id -> {weight: amount}
+        self.deleted_brands = []  # brand ids
+        self.deleted_tiers = []   # tier ids (including those of deleted brands)
+        self.rows = 0
+        self.unchanged = 0        # Tier rows that matched the database exactly
+
+    def changes(self):
+        return (len(self.new_brands) + len(self.brand_logos) + len(self.new_tiers) + len(self.tier_logos)
+                + len(self.tier_prices) + len(self.deleted_brands) + len(self.deleted_tiers))
+
+    def summary(self):
+        return (f"{len(self.new_brands)} new brand(s), {len(self.new_tiers)} new tier(s), "
+                f"{len(self.brand_logos) + len(self.tier_logos)} logo change(s), {len(self.tier_prices)} tier(s) with new prices, "
+                f"{len(self.deleted_brands)} brand(s) and {len(self.deleted_tiers)} tier(s) deleted; {self.unchanged} tier(s) unchanged")
+
+def _prices_hash(prices):
+    return hash(tuple(sorted(prices.items())))
+
+def diff_menu(conn, rows):
+    """MenuDiff for a stream of sync_catalog()-style rows against the current catalog.
+
+    The catalog is read once; each tier is kept as its id, nametag logo and
+    a hash of its prices, so rows are compared as they stream in and only
+    the ones that differ are held on to."""
+    brands = {(name, category): (brand_id, logo) for brand_id, name, category, logo
+              in conn.execute("SELECT id, name, category, logo_path FROM brands")}
+    prices = {}
+    for tier_id, weight, price in conn.execute("SELECT tier_id, weight, price FROM tier_prices"):
+        prices.setdefault(tier_id, {})[weight] = price
+    tiers = {}
+    for tier_id, brand_id, name, logo in conn.execute("SELECT id, brand_id, name, nametag_logo_path FROM tiers"):
+        tiers[(brand_id, name)] = (tier_id, logo, _prices_hash(prices.get(tier_id, {})))
+    del prices
+    diff = MenuDiff()
+    seen_brands, seen_tiers, categories = set(), set(), set()
+    for row in rows:
+        diff.rows += 1
+        category, brand_name, tier_name = row['category'], row['brand'], row.get('tier')
+        categories.add(category)
+        key = (brand_name, category)
+        brand = brands.get(key)
+        logo = row.get('logo_path')
+        if brand is None:
+            if diff.new_brands.get(key) is None:
+                diff.new_brands[key] = logo
+        elif logo and logo != brand[1] and brand[0] not in diff.brand_logos:
+            diff.brand_logos[brand[0]] = logo
+        seen_brands.add(key)
+        if not tier_name:
+            continue
+        amounts = {}
+        for weight, text in (row.get('prices') or {}).items():
+            try:
+                amount = parse_amount(text)
+            except ValueError:
+                raise ValueError(f"{brand_name} {tier_name}: {weight} price must be a number, got {text!r}")
+            if amount is not None:
+                amounts[weight] = amount
+        nametag_logo = row.get('nametag_logo_path')
+        tier = tiers.get((brand[0], tier_name)) if brand else None
+        if tier is None:
+            diff.new_tiers.setdefault(key + (tier_name,), (nametag_logo, amounts or None))
+            continue
+        tier_id, old_logo, old_prices = tier
+        if tier_id in seen_tiers:
+            continue  # Repeated row for a tier; the first one counts
+        seen_tiers.add(tier_id)
+        changed = False
+        if nametag_logo and nametag_logo != old_logo:
+            diff.tier_logos[tier_id] = nametag_logo
+            changed = True
+        if amounts and _prices_hash(amounts) != old_prices:
+            diff.tier_prices[tier_id] = amounts
+            changed = True
+        if not changed:
+            diff.unchanged += 1
+    if not diff.rows:
+        raise ValueError("The feed is empty; nothing would be left in the catalog")
+    for (name, category), (brand_id, _) in brands.items():
+        if category in categories and (name, category) not in seen_brands:
+            diff.deleted_brands.append(brand_id)
+    category_of = {brand_id: category for (_, category), (brand_id, _) in brands.items()}
+    for (brand_id, _), (tier_id, _, _) in tiers.items():
+        if category_of.get(brand_id) in categories and tier_id not in seen_tiers:
+            diff.deleted_tiers.append(tier_id)
+    return diff
+
+def apply_menu_diff(conn, diff):
+    """Applies a MenuDiff in one transaction. Returns the seconds it took."""
+    started = time.perf_counter()
+    with conn:
+        conn.executemany("INSERT INTO brands (name, category, logo_path) VALUES (?, ?, ?)",
+                         [(name, category, logo) for (name, category), logo in diff.new_brands.items()])
+        conn.executemany("UPDATE brands SET logo_path=? WHERE id=?", [(logo, brand_id) for brand_id, logo in diff.brand_logos.items()])
+        if diff.new_tiers:
+            brand_ids = {(name, category): brand_id for brand_id, name, category in conn.execute("SELECT id, name, category FROM brands")}
+            conn.executemany("INSERT INTO tiers (brand_id, name, nametag_logo_path) VALUES (?, ?, ?)",
+                             [(brand_ids[(brand, category)], tier, logo) for (brand, category, tier), (logo, _) in diff.new_tiers.items()])
+            tier_ids = {(brand_id, name): tier_id for tier_id, brand_id, name in conn.execute("SELECT id, brand_id, name FROM tiers")}
+            conn.executemany("INSERT INTO tier_prices (tier_id, weight, price) VALUES (?, ?, ?)",
+                             [(tier_ids[(brand_ids[(brand, category)], tier)], weight, amount)
+                              for (brand, category, tier), (_, amounts) in diff.new_tiers.items()
+                              for weight, amount in (amounts or {}).items()])
+        conn.executemany("UPDATE tiers SET nametag_logo_path=? WHERE id=?", [(logo, tier_id) for tier_id, logo in diff.tier_logos.items()])
+        for tier_id, amounts in diff.tier_prices.items():
+            set_tier_prices(conn, tier_id, amounts)  # price_version only moves if a price really changed
+        delete_tier_prices(conn, diff.deleted_tiers)
+        conn.executemany("DELETE FROM tiers WHERE id=?", [(tier_id,) for tier_id in diff.deleted_tiers])
+        conn.executemany("DELETE FROM brands WHERE id=?", [(brand_id,) for brand_id in diff.deleted_brands])
+    return time.perf_counter() - started
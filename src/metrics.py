@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_PATH = os.path.join('output', 'metrics.jsonl')
+PHASES = ('decode', 'layout', 'draw', 'save', 'merge', 'cache')
+DISPATCH_PHASES = ('open', 'print', 'archive')  # Steps run on the finished file, see dispatch.py
+
+class JobMetrics:
+    """Per-phase timers and counters for one generation job.
+
+    Phases are 'decode' (logo loading/scaling), 'layout' (building draw ops),
+    'draw' (replaying them onto the canvas), 'save' (writing the PDF),
+    'merge' (joining shards/chunks/cached pages) and 'cache' (render cache
+    hashing and writes). Opening, printing and archiving the result happen
+    afterwards, in dispatch.py; they get their own 'dispatch' record with
+    DISPATCH_PHASES, whose 'for_job' is the generation job's id.
+    The hot loop adds to the timers directly with add(); everything else can
+    use `with metrics.phase(name)`. record() is one JSON-able dict per job."""
+
+    def __init__(self, kind='generate', phases=PHASES):
+        self.kind = kind
+        self.id = uuid.uuid4().hex[:12]
+        self.created = datetime.now().isoformat(timespec='seconds')
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.timers = dict.fromkeys(phases, 0.0)
+        self.counters = {}
+        self.info = {}
+        self._slowest = (0.0, None)  # (seconds, strain name) of the slowest label
+        self._label_seconds = 0.0
+
+    def add(self, phase, seconds):
+        self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def label(self, name, seconds):
+        # One label pair drawn; keeps the total and the slowest rather than every label
+        self.count('labels')
+        self._label_seconds += seconds
+        if seconds > self._slowest[0]:
+            self._slowest = (seconds, name)
+
+    def merge(self, record):
+        # Folds a worker's record (e.g. a parallel shard) into this job
+        for phase, seconds in record['phases'].items():
+            self.add(phase, seconds)
+        for name, n in record['counters'].items():
+            self.count(name, n)
+        self._label_seconds += record['labels']['total_seconds']
+        if record['labels']['slowest_seconds'] > self._slowest[0]:
+            self._slowest = (record['labels']['slowest_seconds'], record['labels']['slowest'])
+
+    def finish(self, **info):
+        self.elapsed = time.perf_counter() - self.started
+        self.info.update(info)
+
+    def record(self):
+        labels = self.counters.get('labels', 0)
+        return {
+            'job': self.kind,
+            'id': self.id,
+            'created': self.created,
+            'seconds': round(self.elapsed if self.elapsed is not None else time.perf_counter() - self.started, 4),
+            'phases': {phase: round(seconds, 4) for phase, seconds in self.timers.items()},
+            'counters': dict(self.counters),
+            'labels': {
+                'total_seconds': round(self._label_seconds, 4),
+                'mean_ms': round(self._label_seconds / labels * 1000, 3) if labels else None,
+                'slowest_seconds': round(self._slowest[0], 4),
+                'slowest': self._slowest[1],
+            },
+            **self.info,
+        }
+
+    def write(self, path=METRICS_PATH):
+        # Appends this job as one JSON line
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.record()) + '\n')
+
+@contextmanager
+def profiled(path, top=20):
+    """cProfile whatever runs inside the block (in this thread); stats go to path and the top calls are printed."""
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.dump_stats(path)
+        print(f"Profile written to {path} (view with: python -m pstats {path})")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
@@ -1,8 +1,31 @@
+import sys
+
 CLASSIFICATIONS = ["Sativa", "Sativa Hybrid", "Hybrid", "Indica Hybrid", "Indica"]
+PRICE_WEIGHTS = ["1g", "3.5g", "7g", "14g", "28g", "1lb"]
 
 class Strain:
+    # Slotted, with interned text: a big job repeats the same names, classifications and lineages thousands of times
+    __slots__ = ('name', 'classification', 'thc_percent', 'lineage')
+
     def __init__(self, name, classification, thc_percent, lineage=''):
-        self.name = name
-        self.classification = classification
+        self.name = _intern(name)
+        self.classification = _intern(classification)
         self.thc_percent = thc_percent
-        self.lineage = lineage
\ No newline at end of file
+        self.lineage = _intern(lineage)
+
+class QueueItem:
+    """One nametag/pricetag pair in a LabelGenerator queue.
+
+    brand and tier are the Catalog's dicts, shared by every item of that
+    brand and tier rather than copied. Slotted, so a 50k-label queue costs
+    a few MB instead of a dict per item."""
+    __slots__ = ('id', 'strain', 'brand', 'tier')
+
+    def __init__(self, item_id, strain, brand, tier):
+        self.id = item_id
+        self.strain = strain
+        self.brand = brand
+        self.tier = tier
+
+def _intern(text):
+    return sys.intern(text) if type(text) is str else text
\ No newline at end of file
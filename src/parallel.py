@@ -0,0 +1,66 @@
+import os
+import math
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from generator import LabelGenerator
+from stock import STOCKS, DEFAULT_STOCK
+from metrics import JobMetrics
+from pdfmerge import PdfConcatenator
+
+MIN_PAGES_PER_SHARD = 25  # Smaller shards spend more time on process hand-off than on drawing
+
+def _render_shard(job):
+    # Runs in a worker process: renders one page-aligned slice of the queue to its own PDF
+    items, part_path, stock = job
+    gen = LabelGenerator(None, metrics_path=None, stock=stock)
+    gen.render_cache = None  # Shards are rendered once and merged; caching is for serial reprints
+    gen.queue = items
+    metrics = JobMetrics('shard')
+    gen.generate_pdf(part_path, metrics=metrics)
+    return part_path, metrics.record()
+
+def plan_shards(num_items, workers, pages_per_shard=None, pairs_per_page=None):
+    # Page-aligned (start, end) item ranges, so shard pages line up with a serial run
+    pairs_per_page = pairs_per_page or STOCKS[DEFAULT_STOCK].pairs_per_page
+    pages = math.ceil(num_items / pairs_per_page)
+    if pages_per_shard is None:
+        # A few shards per worker keeps every process busy until the end
+        pages_per_shard = max(MIN_PAGES_PER_SHARD, math.ceil(pages / (workers * 4)))
+    step = pages_per_shard * pairs_per_page
+    return [(start, min(start + step, num_items)) for start in range(0, num_items, step)]
+
+def generate_pdf_parallel(queue, pdf_path, workers=None, pages_per_shard=None, metrics=None, stock=None):
+    """Renders queue across a process pool and merges the shards, in order, into pdf_path.
+
+    Shard timings are summed into metrics, so phases add up to CPU time
+    across workers rather than wall time."""
+    if not queue:
+        raise ValueError("Queue is empty. Add pairs first.")
+    workers = workers or os.cpu_count() or 1
+    if metrics is None:
+        metrics = JobMetrics()
+    stock = stock or STOCKS[DEFAULT_STOCK]
+    shards = plan_shards(len(queue), workers, pages_per_shard, stock.pairs_per_page)
+    if os.path.dirname(pdf_path):
+        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='shards-', dir=os.path.dirname(pdf_path) or '.')
+    jobs = [(queue[start:end], os.path.join(work_dir, f"shard{i:05d}.pdf"), stock) for i, (start, end) in enumerate(shards)]
+    merger = PdfConcatenator(pdf_path)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            # map() yields in submission order, so shards are appended while later ones still render
+            for part_path, record in pool.map(_render_shard, jobs):
+                metrics.merge(record)
+                with metrics.phase('merge'):
+                    merger.append(part_path)
+                    os.remove(part_path)
+        with metrics.phase('merge'):
+            merger.close()
+        metrics.count('shards', len(jobs))
+    except BaseException:
+        merger.abort()
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return pdf_path
@@ -0,0 +1,207 @@
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+
+_REF = re.compile(rb'(\d+) 0 R\b')
+_STREAM = re.compile(rb'>>\s*stream\r?\n')
+
+class PdfPart:
+    """A reportlab-written PDF read into memory: its objects and its pages in order."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.objects = _read_objects(data)
+        trailer = data[data.rindex(b'trailer'):]
+        root = int(re.search(rb'/Root (\d+) 0 R', trailer).group(1))
+        info = re.search(rb'/Info (\d+) 0 R', trailer)
+        pages_root = int(re.search(rb'/Pages (\d+) 0 R', self.objects[root]).group(1))
+        self.pages, self.page_tree = _walk_pages(self.objects, pages_root)
+        # The catalog, info and page tree are replaced by the concatenator's own
+        self.skipped = {root, pages_root} | self.page_tree
+        if info:
+            self.skipped.add(int(info.group(1)))
+
+class PdfConcatenator:
+    """Appends the pages of reportlab-written PDFs to one output file.
+
+    Objects are copied (renumbered) straight to disk as each part is added.
+    Their xref entries and the page list are spilled to temporary files, so
+    memory stays flat however many parts are added. Objects repeated across
+    parts (images, fonts, pricetag forms) are written once. The page tree,
+    catalog and xref are written by close(). The output appears at out_path
+    atomically once close() succeeds."""
+
+    PAGES_OBJ = 1
+    CATALOG_OBJ = 2
+    SPILL_BYTES = 1024 * 1024
+
+    def __init__(self, out_path):
+        self.out_path = out_path
+        self._tmp_path = f"{out_path}.{os.getpid()}.part"
+        self._f = open(self._tmp_path, 'wb')
+        self._f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self._next_obj = 3       # 1 and 2 (page tree and catalog) are written by close()
+        self._offsets = {}       # Byte offsets of the objects written for the current part
+        # Finished xref entries (objects 3 onwards) and page references in order; kept in memory
+        # until they pass SPILL_BYTES, so small outputs (e.g. cached single pages) never touch disk
+        self._xref = tempfile.SpooledTemporaryFile(self.SPILL_BYTES)
+        self._kids = tempfile.SpooledTemporaryFile(self.SPILL_BYTES)
+        self._shared = {}  # Digest of an image/font object -> object number already written
+        self.page_count = 0
+
+    def append(self, part, pages=None):
+        """Adds a part's pages (a path or PdfPart); pages picks page indexes to copy, default all."""
+        if not isinstance(part, PdfPart):
+            part = PdfPart(part)
+        objects = part.objects
+        page_nums = part.pages
+        if pages is None:
+            keep = sorted(set(objects) - part.skipped)
+        else:
+            page_nums = [page_nums[i] for i in pages]
+            keep = sorted(_reachable(objects, page_nums, part.skipped))
+        dropped = set()  # Objects replaced by an identical one already written
+        mapping = {n: self.PAGES_OBJ for n in part.page_tree}
+        first_obj = self._next_obj
+        shareable = []
+        renumbered = {}
+        for num in keep:
+            if _is_shareable(objects[num]):
+                shareable.append(num)
+            else:
+                mapping[num] = self._allocate()
+        renumber = lambda m: b'%d 0 R' % mapping[int(m.group(1))]
+        # Shared objects are matched on their renumbered body, so e.g. a form is only shared once
+        # its fonts have been; resolve them in passes until every reference is known
+        while shareable:
+            pending = []
+            for num in shareable:
+                head, tail = _split(objects[num])
+                if any(int(ref) not in mapping for ref in _REF.findall(head)):
+                    pending.append(num)
+                    continue
+                body = _REF.sub(renumber, head) + tail
+                digest = hashlib.sha1(body).digest()
+                if digest in self._shared:
+                    mapping[num] = self._shared[digest]
+                    dropped.add(num)
+                else:
+                    mapping[num] = self._shared[digest] = self._allocate()
+                    renumbered[num] = body
+            if len(pending) == len(shareable):
+                # Reference cycle: copy what is left as it is instead of sharing it
+                for num in pending:
+                    mapping[num] = self._allocate()
+                break
+            shareable = pending
+        for num in keep:
+            if num in dropped:
+                continue
+            if num not in renumbered:
+                head, tail = _split(objects[num])
+                renumbered[num] = _REF.sub(renumber, head) + tail
+            self._write(mapping[num], renumbered.pop(num))
+        self._xref.write(b''.join(b'%010d 00000 n \n' % self._offsets[num] for num in range(first_obj, self._next_obj)))
+        self._offsets.clear()
+        self._kids.write(b''.join(b'%d 0 R ' % mapping[num] for num in page_nums))
+        self.page_count += len(page_nums)
+
+    def close(self):
+        pages_offset = self._f.tell()
+        self._f.write(b'%d 0 obj\n<<\n/Count %d /Kids [ ' % (self.PAGES_OBJ, self.page_count))
+        self._kids.seek(0)
+        shutil.copyfileobj(self._kids, self._f)
+        self._f.write(b'] /Type /Pages\n>>\nendobj\n')
+        catalog_offset = self._f.tell()
+        self._f.write(b'%d 0 obj\n<<\n/PageMode /UseNone /Pages %d 0 R /Type /Catalog\n>>\nendobj\n' % (self.CATALOG_OBJ, self.PAGES_OBJ))
+        xref_offset = self._f.tell()
+        self._f.write(b'xref\n0 %d\n0000000000 65535 f \n' % self._next_obj)
+        self._f.write(b'%010d 00000 n \n%010d 00000 n \n' % (pages_offset, catalog_offset))
+        self._xref.seek(0)
+        shutil.copyfileobj(self._xref, self._f)
+        self._f.write(b'trailer\n<<\n/Root %d 0 R /Size %d\n>>\nstartxref\n%d\n%%%%EOF\n' % (self.CATALOG_OBJ, self._next_obj, xref_offset))
+        self._f.close()
+        self._kids.close()
+        self._xref.close()
+        os.replace(self._tmp_path, self.out_path)
+
+    def abort(self):
+        self._f.close()
+        self._kids.close()
+        self._xref.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def _allocate(self):
+        self._next_obj += 1
+        return self._next_obj - 1
+
+    def _write(self, num, body):
+        self._offsets[num] = self._f.tell()
+        self._f.write(b'%d 0 obj\n' % num)
+        self._f.write(body)
+        if not body.endswith(b'\n'):
+            self._f.write(b'\n')
+        self._f.write(b'endobj\n')
+
+def _split(body):
+    # (dictionary, stream) - references are only ever rewritten in the dictionary
+    stream = _STREAM.search(body)
+    if stream:
+        return body[:stream.start()], body[stream.start():]
+    return body, b''
+
+def _is_shareable(body):
+    # Any object is interchangeable with an identical one once its references match, except pages,
+    # which must stay distinct entries in the page tree
+    return not re.search(rb'/Type /Page\b', _split(body)[0])
+
+def _reachable(objects, starts, stop):
+    # Object numbers reachable from starts without passing through stop (the page tree)
+    seen = set()
+    todo = list(starts)
+    while todo:
+        num = todo.pop()
+        if num in seen or num in stop or num not in objects:
+            continue
+        seen.add(num)
+        todo.extend(int(ref) for ref in _REF.findall(_split(objects[num])[0]))
+    return seen
+
+def _read_objects(data):
+    # Object bodies located via the xref table (reportlab writes a single classic xref)
+    xref_start = int(data[data.rindex(b'startxref') + 9:].split()[0])
+    lines = data[xref_start:].split(b'\n')
+    first, count = (int(v) for v in lines[1].split())
+    offsets = {}
+    for i, line in enumerate(lines[2:2 + count]):
+        fields = line.split()
+        if fields[2] == b'n':
+            offsets[first + i] = int(fields[0])
+    objects = {}
+    ordered = sorted(offsets.items(), key=lambda item: item[1])
+    for idx, (num, offset) in enumerate(ordered):
+        end = ordered[idx + 1][1] if idx + 1 < len(ordered) else xref_start
+        chunk = data[offset:end]
+        body_start = chunk.index(b'obj') + 3
+        body_end = chunk.rindex(b'endobj')
+        objects[num] = chunk[body_start:body_end].lstrip(b'\r\n')
+    return objects
+
+def _walk_pages(objects, node):
+    # Returns (leaf page objects in order, all /Pages node numbers)
+    body = objects[node]
+    kids = re.search(rb'/Kids\s*\[(.*?)\]', body, re.S)
+    if not kids:
+        return [node], set()
+    pages = []
+    tree = {node}
+    for kid in _REF.findall(kids.group(1)):
+        kid_pages, kid_tree = _walk_pages(objects, int(kid))
+        pages.extend(kid_pages)
+        tree |= kid_tree
+    return pages, tree
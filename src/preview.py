@@ -0,0 +1,133 @@
+import os
+import time
+from assets import LogoCache
+from layout import pricetag_key
+
+PREVIEW_ZOOM = 1.25        # Pixels per point
+PRICETAG_LAYERS = 64       # Rendered pricetags kept for reuse
+LOGO_LAYERS = 32           # Scaled logos kept for reuse
+FONTS = 64                 # Loaded (font, size) pairs kept; auto-fit sizes vary with every long name
+# reportlab's bundled Type 1 clones of the standard fonts, so previews have the PDF's metrics
+FONT_FILES = {
+    'Helvetica': '_a______.pfb',
+    'Helvetica-Bold': '_ab_____.pfb',
+    'Helvetica-Oblique': '_ai_____.pfb',
+    'Helvetica-BoldOblique': '_abi____.pfb',
+}
+
+class LabelPreview:
+    """Draws one nametag/pricetag pair to a PIL image, for the Generate tab.
+
+    Uses the generator's LabelTemplate ops, so the layout matches the PDF.
+    The blank pair, scaled logos and whole pricetags are cached as layers,
+    and loaded fonts by size; each cache is cleared when it fills up.
+    Each render pastes them and draws only the nametag text, which is all
+    that changes while someone types. Layers are dropped when the template
+    changes (another label stock). PIL and reportlab are only loaded on the
+    first render."""
+
+    def __init__(self, zoom=PREVIEW_ZOOM):
+        self.zoom = zoom
+        self.logos = LogoCache()  # Own cache: a generation job may be using the generator's in another thread
+        self.last_seconds = None  # Time the latest render took
+        self._template = None
+        self._fonts = {}          # (font, size) -> ImageFont
+        self._logo_layers = {}    # (path, width, height) -> RGBA image at preview size
+        self._pricetags = {}      # pricetag_key -> RGBA image of the pricetag half
+
+    def render(self, template, strain, brand, tier):
+        started = time.perf_counter()
+        if template is not self._template:
+            self._template = template
+            self._pricetags.clear()
+            self._blank = self._new_layer(2 * template.label_width, template.label_height, 'white')
+            self._outline(self._blank, 0)
+            self._outline(self._blank, template.label_width)
+        image = self._blank.copy()
+        key = pricetag_key(brand, tier)
+        pricetag = self._pricetags.get(key)
+        if pricetag is None:
+            if len(self._pricetags) >= PRICETAG_LAYERS:
+                self._pricetags.clear()
+            pricetag = self._pricetags[key] = self._draw_layer(template.pricetag_ops(brand, tier), template.label_width)
+        image.alpha_composite(pricetag, (self._px(template.label_width), 0))
+        logo = None
+        logo_path = tier.get('nametag_logo_path')
+        if logo_path:
+            try:
+                logo = self.logos.get(logo_path, template.max_logo_width, template.max_logo_height)
+            except Exception as e:  # As in the PDF, a logo that won't load leaves the label without one
+                print(f"Preview logo error: {e}")
+        self._draw(image, template.nametag_ops(strain, brand, tier, logo), 0)
+        self.last_seconds = time.perf_counter() - started
+        return image
+
+    def _px(self, points):
+        return round(points * self.zoom)
+
+    def _new_layer(self, width, height, color=(255, 255, 255, 0)):
+        from PIL import Image
+        return Image.new('RGBA', (self._px(width), self._px(height)), color)
+
+    def _outline(self, image, x):
+        from PIL import ImageDraw
+        left = self._px(x)
+        right = left + self._px(self._template.label_width) - 1
+        ImageDraw.Draw(image).rectangle((left, 0, right, image.height - 1), outline=(200, 200, 200))
+
+    def _draw_layer(self, ops, x_offset):
+        # Ops for the half of the pair starting at x_offset, on a transparent layer of one label
+        layer = self._new_layer(self._template.label_width, self._template.label_height)
+        self._draw(layer, ops, -x_offset)
+        return layer
+
+    def _draw(self, image, ops, x_offset):
+        from PIL import ImageDraw
+        draw = ImageDraw.Draw(image)
+        zoom = self.zoom
+        for op in ops:
+            kind = op[0]
+            if kind == 'text':
+                _, font_name, size, x, y, text, color, align = op
+                fill = tuple(round(c * 255) for c in color) if color else (0, 0, 0)
+                draw.text(((x + x_offset) * zoom, -y * zoom), text, font=self._font(font_name, size), fill=fill,
+                          anchor='ms' if align == 'centre' else 'ls')
+            elif kind == 'line':
+                _, x1, y1, x2, y2, line_width = op
+                draw.line(((x1 + x_offset) * zoom, -y1 * zoom, (x2 + x_offset) * zoom, -y2 * zoom),
+                          fill=(0, 0, 0), width=max(1, round(line_width * zoom)))
+            elif kind == 'image':
+                _, path, x, y, w, h = op
+                layer = self._logo_layer(path, w, h)
+                if layer is not None:
+                    image.alpha_composite(layer, (round((x + x_offset) * zoom), round(-(y + h) * zoom)))
+
+    def _font(self, font_name, size):
+        from PIL import ImageFont
+        key = (font_name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            if len(self._fonts) >= FONTS:
+                self._fonts.clear()
+            import reportlab
+            path = os.path.join(os.path.dirname(reportlab.__file__), 'fonts', FONT_FILES.get(font_name, FONT_FILES['Helvetica']))
+            try:
+                font = ImageFont.truetype(path, size * self.zoom)
+            except OSError:
+                font = ImageFont.load_default(size * self.zoom)
+            self._fonts[key] = font
+        return font
+
+    def _logo_layer(self, path, width, height):
+        from PIL import Image
+        key = (path, width, height)
+        if key not in self._logo_layers:
+            if len(self._logo_layers) >= LOGO_LAYERS:
+                self._logo_layers.clear()
+            try:
+                with Image.open(path) as img:
+                    self._logo_layers[key] = img.convert('RGBA').resize((max(1, self._px(width)), max(1, self._px(height))), Image.LANCZOS)
+            except Exception as e:
+                print(f"Preview logo error: {e}")
+                self._logo_layers[key] = None
+        return self._logo_layers[key]
@@ -0,0 +1,207 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+class QueueView(ttk.Frame):
+    """Virtualized queue table: only `rows` Treeview rows ever exist.
+
+    The full queue lives in plain lists; scrolling just rebinds the visible
+    rows to a different window of it. Adding or removing items updates the
+    filtered/sorted view in place instead of rebuilding the widget, and the
+    selection is tracked by item id so it survives scrolling, sorting and
+    filtering."""
+
+    COLUMNS = (
+        ('category', 'Cat', 45),
+        ('brand', 'Brand', 120),
+        ('tier', 'Tier', 100),
+        ('strain', 'Strain', 140),
+        ('class', 'Classification', 100),
+        ('thc', 'THC %', 55),
+        ('lineage', 'Lineage', 140),
+    )
+    THC_COLUMN = 5
+
+    def __init__(self, parent, rows=8):
+        super().__init__(parent)
+        self.rows = rows
+        self._values = {}   # item id -> row values
+        self._search = {}   # item id -> lowercased text the filter matches against
+        self._seq = {}      # item id -> insertion order, keeps sorts stable
+        self._counter = 0
+        self._view = []     # ids that pass the filter, ascending by _view_keys
+        self._view_keys = []
+        self._sort_col = None
+        self._reverse = False
+        self._top = 0
+        self._selected = set()
+        self._filter_after = None
+        # Filter box
+        bar = ttk.Frame(self)
+        bar.pack(fill='x')
+        tk.Label(bar, text="Filter").pack(side='left')
+        self.filter_var = tk.StringVar()
+        tk.Entry(bar, textvariable=self.filter_var).pack(side='left', fill='x', expand=True)
+        self.count_label = tk.Label(bar, text="")
+        self.count_label.pack(side='right')
+        self.filter_var.trace_add('write', lambda *args: self._schedule_filter())
+        # Table with a fixed pool of rows and our own scrollbar
+        body = ttk.Frame(self)
+        body.pack(fill='both', expand=True)
+        self.tree = ttk.Treeview(body, columns=[c[0] for c in self.COLUMNS], show='headings', height=rows, selectmode='extended')
+        for col, (key, title, width) in enumerate(self.COLUMNS):
+            self.tree.heading(key, text=title, command=lambda col=col: self.sort_by(col))
+            self.tree.column(key, width=width, stretch=True)
+        self.scrollbar = ttk.Scrollbar(body, orient='vertical', command=self._on_scrollbar)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        self._slots = [self.tree.insert('', 'end', values=()) for _ in range(rows)]
+        self._slot_index = {slot: i for i, slot in enumerate(self._slots)}
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', lambda e: self._scroll_to(self._top - (1 if e.delta > 0 else -1) * 3))
+        self.tree.bind('<Button-4>', lambda e: self._scroll_to(self._top - 3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_to(self._top + 3))
+        self.tree.bind('<Control-a>', lambda e: self.select_all())
+        self._render()
+
+    # Data updates
+
+    def set_items(self, items):
+        self._values.clear()
+        self._search.clear()
+        self._seq.clear()
+        self._selected.clear()
+        for item in items:
+            self._store(item)
+        self._rebuild_view()
+
+    def add(self, item):
+        item_id = self._store(item)
+        if self._matches(item_id):
+            key = self._key(item_id)
+            pos = bisect.bisect(self._view_keys, key)
+            self._view_keys.insert(pos, key)
+            self._view.insert(pos, item_id)
+            if self._sort_col is None:
+                self._scroll_to(len(self._view))  # Follow new entries like the old list did
+                return
+        self._render()
+
+    def remove(self, ids):
+        ids = set(ids)
+        for item_id in ids:
+            self._values.pop(item_id, None)
+            self._search.pop(item_id, None)
+            self._seq.pop(item_id, None)
+        self._selected -= ids
+        keep = [i for i, item_id in enumerate(self._view) if item_id not in ids]
+        self._view = [self._view[i] for i in keep]
+        self._view_keys = [self._view_keys[i] for i in keep]
+        self._scroll_to(self._top)
+
+    def selected_ids(self):
+        return set(self._selected)
+
+    def select_all(self):
+        # Selects everything that passes the filter, not just the visible rows
+        self._selected = set(self._view)
+        self._render()
+        return 'break'
+
+    def sort_by(self, col):
+        if self._sort_col == col:
+            self._reverse = not self._reverse
+        else:
+            self._sort_col, self._reverse = col, False
+        for c, (key, title, _) in enumerate(self.COLUMNS):
+            arrow = (' ▼' if self._reverse else ' ▲') if c == col else ''
+            self.tree.heading(key, text=title + arrow)
+        self._rebuild_view()
+
+    # Internals
+
+    def _store(self, item):
+        strain = item.strain
+        item_id = item.id
+        values = (item.brand['category'], item.brand['name'], item.tier['name'], strain.name,
+                  strain.classification, strain.thc_percent, strain.lineage or '')
+        self._values[item_id] = values
+        self._search[item_id] = ' '.join(str(v) for v in values).lower()
+        self._seq[item_id] = self._counter
+        self._counter += 1
+        return item_id
+
+    def _key(self, item_id):
+        if self._sort_col is None:
+            return (self._seq[item_id],)
+        value = self._values[item_id][self._sort_col]
+        if self._sort_col != self.THC_COLUMN:
+            value = str(value).lower()
+        return (value, self._seq[item_id])
+
+    def _matches(self, item_id):
+        text = self.filter_var.get().strip().lower()
+        return all(word in self._search[item_id] for word in text.split())
+
+    def _rebuild_view(self):
+        keyed = sorted((self._key(item_id), item_id) for item_id in self._values if self._matches(item_id))
+        self._view_keys = [key for key, _ in keyed]
+        self._view = [item_id for _, item_id in keyed]
+        self._scroll_to(0 if self._sort_col is not None else self._top)
+
+    def _schedule_filter(self):
+        # Debounced so typing in the filter box doesn't rescan the queue per keystroke
+        if self._filter_after is not None:
+            self.after_cancel(self._filter_after)
+        self._filter_after = self.after(150, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_after = None
+        self._top = 0
+        self._rebuild_view()
+
+    def _visible_ids(self):
+        n = len(self._view)
+        if self._reverse:
+            return [self._view[n - 1 - p] for p in range(self._top, min(self._top + self.rows, n))]
+        return self._view[self._top:self._top + self.rows]
+
+    def _scroll_to(self, top):
+        self._top = max(0, min(top, len(self._view) - self.rows))
+        self._render()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self._scroll_to(int(float(amount) * len(self._view)))
+        else:
+            self._scroll_to(self._top + int(amount) * (self.rows if unit == 'pages' else 1))
+
+    def _render(self):
+        visible = self._visible_ids()
+        for i, slot in enumerate(self._slots):
+            if i < len(visible):
+                self.tree.item(slot, values=self._values[visible[i]])
+                self.tree.move(slot, '', i)
+            else:
+                self.tree.detach(slot)
+        self.tree.selection_set([slot for slot, item_id in zip(self._slots, visible) if item_id in self._selected])
+        n = len(self._view)
+        if n > self.rows:
+            self.scrollbar.set(self._top / n, (self._top + self.rows) / n)
+        else:
+            self.scrollbar.set(0, 1)
+        self._update_count()
+
+    def _on_select(self, event=None):
+        # Fires for clicks and for our own selection_set; both leave tree and set in agreement
+        visible = self._visible_ids()
+        picked = {visible[self._slot_index[slot]] for slot in self.tree.selection() if self._slot_index[slot] < len(visible)}
+        self._selected = (self._selected - set(visible)) | picked
+        self._update_count()
+
+    def _update_count(self):
+        shown = len(self._view)
+        text = f"{shown} of {len(self._values)}" if shown != len(self._values) else f"{shown} item(s)"
+        if self._selected:
+            text += f", {len(self._selected)} selected"
+        self.count_label['text'] = text
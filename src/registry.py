@@ -0,0 +1,113 @@
+from datetime import datetime
+from models import Strain
+from strains import remember_strains
+
+def record_printed(conn, labels, output=None):
+    """Adds a print job and its labels to the registry in one transaction.
+
+    labels is an iterable of (strain, brand, tier) as printed. Each tier's
+    'price_version' (from the Catalog) is the version of the prices that were
+    on it when it was queued. Earlier prints of the same strain and tier stop
+    being current, since the new tags replace them. The strains are added
+    to the strain library. Returns the job id."""
+    rows, strains = _label_rows(labels)
+    with conn:
+        job_id = conn.execute("INSERT INTO print_jobs (printed_at, output, pairs) VALUES (?, ?, ?)",
+                              (datetime.now().isoformat(timespec='seconds'), output, len(rows))).lastrowid
+        conn.executemany("UPDATE printed_labels SET current = 0 WHERE current = 1 AND strain = ? AND tier_id = ?",
+                         {(row[0], row[5]) for row in rows})
+        conn.executemany('''INSERT INTO printed_labels (job_id, strain, classification, thc, lineage, brand_id, tier_id, price_version)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, (SELECT price_version FROM tiers WHERE id = ?), 0))''',
+                         [(job_id,) + row for row in rows])
+        remember_strains(conn, strains)
+    return job_id
+
+class PrintJobRecorder:
+    """Records a long job's labels chunk by chunk, for streamed output.
+
+    record_printed() needs every label of the job at once. Here each add()
+    commits its chunk as not-current rows, so memory stays bounded by the
+    chunk. finish() then supersedes earlier prints and makes the job's
+    labels current in one transaction, and abort() removes them (strains
+    already added to the library stay there). Until finish(), nothing about
+    the job shows up as printed."""
+
+    def __init__(self, conn, output=None):
+        self.conn = conn
+        self.pairs = 0
+        self.first_id = None  # The job's rows all have ids from here on
+        with conn:
+            self.job_id = conn.execute("INSERT INTO print_jobs (printed_at, output, pairs) VALUES (?, ?, 0)",
+                                       (datetime.now().isoformat(timespec='seconds'), output)).lastrowid
+
+    def add(self, labels):
+        rows, strains = _label_rows(labels)
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany('''INSERT INTO printed_labels (job_id, strain, classification, thc, lineage, brand_id, tier_id, price_version, current)
+                                     VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, (SELECT price_version FROM tiers WHERE id = ?), 0), 0)''',
+                                  [(self.job_id,) + row for row in rows])
+            if self.first_id is None:
+                # One executemany's rows get consecutive ids; no other connection can write in between
+                self.first_id = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0] - len(rows) + 1
+            remember_strains(self.conn, strains)
+        self.pairs += len(rows)
+
+    def finish(self):
+        with self.conn:
+            if self.first_id is not None:
+                job = "SELECT strain, tier_id FROM printed_labels WHERE id >= ? AND job_id = ?"
+                self.conn.execute(f"UPDATE printed_labels SET current = 0 WHERE current = 1 AND (strain, tier_id) IN ({job})",
+                                  (self.first_id, self.job_id))
+                self.conn.execute('''UPDATE printed_labels SET current = 1 WHERE id IN
+                                     (SELECT MAX(id) FROM printed_labels WHERE id >= ? AND job_id = ? GROUP BY strain, tier_id)''',
+                                  (self.first_id, self.job_id))
+            self.conn.execute("UPDATE print_jobs SET pairs = ? WHERE id = ?", (self.pairs, self.job_id))
+        return self.job_id
+
+    def abort(self):
+        with self.conn:
+            if self.first_id is not None:
+                self.conn.execute("DELETE FROM printed_labels WHERE id >= ? AND job_id = ?", (self.first_id, self.job_id))
+            self.conn.execute("DELETE FROM print_jobs WHERE id = ?", (self.job_id,))
+
+def _label_rows(labels):
+    # printed_labels rows (less job_id) and strains for (strain, brand, tier) labels; tiers not in the catalog are skipped
+    rows, strains = [], []
+    for strain, brand, tier in labels:
+        if tier.get('id') is None:
+            continue
+        strains.append(strain)
+        rows.append((strain.name, strain.classification, strain.thc_percent, strain.lineage,
+                     tier.get('brand_id', brand.get('id')), tier['id'], tier.get('price_version'), tier['id']))
+    return rows, strains
+
+def stale_labels(conn, tier_ids=None):
+    """Current printed labels whose tier's prices changed after they were printed.
+
+    Returns dicts with 'id', 'strain' (a Strain), 'brand_id', 'tier_id',
+    'printed_at' and 'output', oldest print first. Labels of deleted tiers
+    are left out."""
+    sql = '''SELECT p.id, p.strain, p.classification, p.thc, p.lineage, t.brand_id, p.tier_id, j.printed_at, j.output
+             FROM tiers t
+             JOIN printed_labels p ON p.tier_id = t.id AND p.current = 1 AND p.price_version < t.price_version
+             JOIN print_jobs j ON j.id = p.job_id'''
+    params = []
+    if tier_ids is not None:
+        params = list(tier_ids)
+        sql += f" WHERE t.id IN ({','.join('?' * len(params))})"
+    return [{'id': label_id, 'strain': Strain(name, classification, thc, lineage or ''), 'brand_id': brand_id,
+             'tier_id': tier_id, 'printed_at': printed_at, 'output': output}
+            for label_id, name, classification, thc, lineage, brand_id, tier_id, printed_at, output
+            in conn.execute(sql + " ORDER BY p.id", params)]
+
+def reprint_batch(conn, catalog, tier_ids=None):
+    """(strain, brand, tier) for every stale label, with the tier's current prices, ready to queue."""
+    batch = []
+    for label in stale_labels(conn, tier_ids):
+        tier = catalog.tier_by_id(label['tier_id'])
+        brand = catalog.brand_by_id(tier['brand_id']) if tier else None
+        if brand:
+            batch.append((label['strain'], brand, tier))
+    return batch
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+import hashlib
+from assets import PRINT_DPI
+from layout import TEMPLATE_VERSION, tier_color
+
+CACHE_PATH = os.path.join('cache', 'labels.db')
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+OLD_PAGES_DIR = os.path.join('cache', 'pages')  # Whole-page cache of earlier versions
+BATCH = 500  # Keys per SELECT/UPDATE, under SQLite's variable limit
+TOUCH_AFTER = 3600  # Seconds before a hit updates an entry's last use again; rewriting every hit would cost most of a warm run
+
+class RenderCache:
+    """Drawn nametags on disk, keyed by a hash of everything drawn on them.
+
+    A nametag depends on its strain fields, tier name and color, and tier
+    logo (path, size and mtime), plus the template; not on its position or
+    neighbours, so inserting, removing or reordering jars only costs the
+    labels that actually changed. An entry is what
+    generator.draw_ops_recorded() drew, relative to the label's corner:
+    canvas ops plus the PDF code of each line of text. The logo is kept as
+    just its position and drawn live, so it is embedded once per PDF as
+    usual. Pricetags are
+    already one form per distinct tag. Entries live in one SQLite file,
+    trimmed to max_bytes, least recently used first. New entries are
+    written by a background thread once the PDF is done, so a cold run
+    takes no longer than rendering without the cache."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._prefix = (None, None)  # (template, hash of its layout)
+        self._writer = None  # Thread still saving the last job's entries
+
+    def label_keys(self, items, template):
+        # One key per item; everything layout-wide goes into a shared prefix
+        if self._prefix[0] is not template:
+            from reportlab import Version  # Entries hold reportlab's text objects, so a new reportlab starts afresh
+            layout = repr((TEMPLATE_VERSION, PRINT_DPI, Version, sorted(vars(template).items())))
+            self._prefix = (template, hashlib.sha1(layout.encode('utf-8')).digest())
+        base = hashlib.sha1(self._prefix[1])
+        tiers = {}  # id(tier) -> (tier, its part of the key); queues repeat a few tiers many times
+        logos = {}
+        keys = []
+        for item in items:
+            strain, tier = item.strain, item.tier
+            cached = tiers.get(id(tier))
+            if cached is None or cached[0] is not tier:
+                logo_path = tier.get('nametag_logo_path')
+                if logo_path not in logos:
+                    try:
+                        info = os.stat(logo_path) if logo_path else None
+                        logos[logo_path] = (os.path.abspath(logo_path), info.st_size, info.st_mtime_ns) if info else logo_path
+                    except OSError:
+                        logos[logo_path] = 'missing'
+                cached = tiers[id(tier)] = (tier, repr((tier['name'], tier_color(item.brand, tier), logos[logo_path])))
+            digest = base.copy()
+            # NUL-separated rather than repr(): repr() of every label is most of the cost of a key
+            digest.update(f"{strain.name}\0{strain.classification}\0{strain.thc_percent!r}\0{strain.lineage}\0{cached[1]}".encode('utf-8'))
+            keys.append(digest.digest())
+        return keys
+
+    def _connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.isdir(OLD_PAGES_DIR):
+            shutil.rmtree(OLD_PAGES_DIR, ignore_errors=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")  # Several processes (app, CLI, service) may share it
+        conn.execute("PRAGMA synchronous=NORMAL")  # A cache can lose its last writes in a power cut; no fsync per job
+        conn.execute('''CREATE TABLE IF NOT EXISTS nametags
+                        (key BLOB PRIMARY KEY, image_x REAL, image_y REAL, ops TEXT NOT NULL, used REAL NOT NULL) WITHOUT ROWID''')
+        return conn
+
+    def load(self, keys):
+        """({key: (logo position or None, ops)}, keys not used for TOUCH_AFTER) for the keys in the cache."""
+        self.wait()  # The previous job's entries, e.g. when regenerating right away
+        found = {}
+        stale = []
+        unique = sorted(set(keys))  # Batches along the index read fewer pages
+        try:
+            conn = self._connect()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Render cache unavailable: {e}")
+            return found, stale
+        touch_before = time.time() - TOUCH_AFTER
+        try:
+            for start in range(0, len(unique), BATCH):
+                batch = unique[start:start + BATCH]
+                rows = conn.execute(f"SELECT key, image_x, image_y, ops, used FROM nametags WHERE key IN ({','.join('?' * len(batch))})",
+                                    batch)
+                for key, image_x, image_y, ops, used in rows:
+                    found[key] = (None if image_x is None else (image_x, image_y), json.loads(ops))
+                    if used < touch_before:
+                        stale.append(key)
+        except sqlite3.Error as e:
+            print(f"Render cache error: {e}")
+        finally:
+            conn.close()
+        return found, stale
+
+    def save(self, new, touch):
+        """Stores new {key: entry}, marks the touch keys as just used and trims the cache, in the background."""
+        if not new and not touch:
+            return
+        self.wait()
+        # Not a daemon: a command-line run still finishes writing before the process exits
+        self._writer = threading.Thread(target=self._save, args=(new, touch), name='render-cache')
+        self._writer.start()
+
+    def wait(self):
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+    def _save(self, new, touch):
+        now = time.time()
+        try:
+            conn = self._connect()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Render cache unavailable: {e}")
+            return
+        try:
+            with conn:
+                # In key order: inserting along the index is about twice as fast
+                conn.executemany("INSERT OR REPLACE INTO nametags VALUES (?, ?, ?, ?, ?)",
+                                 ((key, image and image[0], image and image[1], json.dumps(ops, separators=(',', ':')), now)
+                                  for key, (image, ops) in sorted(new.items())))
+                touch = sorted(touch)
+                for start in range(0, len(touch), BATCH):
+                    batch = touch[start:start + BATCH]
+                    conn.execute(f"UPDATE nametags SET used = ? WHERE key IN ({','.join('?' * len(batch))})", [now] + batch)
+            if new:
+                self._trim(conn)
+        except sqlite3.Error as e:
+            print(f"Render cache error: {e}")
+        finally:
+            conn.close()
+
+    def _trim(self, conn):
+        # Deletes least recently used entries until the cache fits in max_bytes
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(ops)), 0) FROM nametags").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with conn:
+            conn.execute('''DELETE FROM nametags WHERE key IN
+                            (SELECT key FROM (SELECT key, SUM(LENGTH(ops)) OVER (ORDER BY used, key) - LENGTH(ops) AS before FROM nametags)
+                             WHERE before < ?)''', (total - self.max_bytes,))
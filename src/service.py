@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import multiprocessing
+import urllib.request
+import urllib.error
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from database import DB_PATH
+
+SERVICE_PORT = 8765
+JOBS_DIR = os.path.join('output', 'jobs')
+MAX_PENDING = 100          # Queued + running jobs before submissions get 503
+JOB_HISTORY = 500          # Finished jobs kept (with their output files) for polling
+MAX_REQUEST_BYTES = 20 * 1024 * 1024
+FORMATS = {'pdf': ('.pdf', 'application/pdf'), 'zpl': ('.zpl', 'text/plain; charset=utf-8')}
+
+class JobService:
+    """Label jobs from several stations, rendered on a bounded process pool.
+
+    A job is a list of rows (name, classification, thc, lineage, brand,
+    category, tier, as for 'jarlabeler generate') plus a label stock and a
+    format (pdf or zpl). Each job renders to its own file in jobs_dir, which
+    only appears under its final name once complete. A job identical to one
+    still queued or running is not rendered again; the submitter gets the
+    running job's id. Finished jobs stay pollable until JOB_HISTORY newer
+    ones have finished."""
+
+    def __init__(self, db_path=DB_PATH, workers=2, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        # Spawned, not forked: the HTTP server is threaded
+        self.pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker, initargs=(db_path,))
+        self._jobs = {}      # id -> job dict
+        self._active = {}    # request key -> id of the queued/running job
+        self._futures = {}   # id -> Future while queued/running
+        self._finished = []  # ids in the order they finished
+        self._lock = threading.Lock()
+
+    def submit(self, request):
+        """(job, coalesced) for a request dict with 'items' and optionally 'stock' and 'format'."""
+        from stock import STOCKS, DEFAULT_STOCK
+        items = request.get('items')
+        stock = request.get('stock') or DEFAULT_STOCK
+        fmt = request.get('format') or 'pdf'
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            raise ValueError("'items' must be a non-empty list of label rows")
+        if stock not in STOCKS:
+            raise ValueError(f"Unknown label stock '{stock}' (built in: {', '.join(STOCKS)})")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (pdf or zpl)")
+        key = hashlib.sha1(json.dumps([items, stock, fmt], sort_keys=True).encode('utf-8')).hexdigest()
+        with self._lock:
+            job_id = self._active.get(key)
+            if job_id is not None:
+                return self._view(self._jobs[job_id]), True
+            if len(self._futures) >= MAX_PENDING:
+                raise OverflowError(f"{MAX_PENDING} jobs are already waiting")
+            job_id = uuid.uuid4().hex[:16]
+            output = os.path.join(self.jobs_dir, job_id + FORMATS[fmt][0])
+            job = {'id': job_id, 'status': 'queued', 'pairs': len(items), 'stock': stock, 'format': fmt,
+                   'submitted': time.time(), 'finished': None, 'seconds': None, 'error': None, 'output': output}
+            self._jobs[job_id] = job
+            self._active[key] = job_id
+            future = self._futures[job_id] = self.pool.submit(_run_job, items, stock, fmt, output)
+        future.add_done_callback(lambda future: self._done(job_id, key, future))
+        return self._view(job), False
+
+    def _done(self, job_id, key, future):
+        with self._lock:
+            job = self._jobs[job_id]
+            del self._active[key]
+            del self._futures[job_id]
+            job['finished'] = time.time()
+            try:
+                job['seconds'] = future.result()
+                job['status'] = 'done'
+            except Exception as e:
+                job['status'] = 'failed'
+                job['error'] = str(e)
+            self._finished.append(job_id)
+            expired = self._finished[:-JOB_HISTORY]
+            del self._finished[:-JOB_HISTORY]
+            for old_id in expired:
+                old = self._jobs.pop(old_id)
+                if os.path.exists(old['output']):
+                    os.remove(old['output'])
+
+    def job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._view(job) if job else None
+
+    def jobs(self):
+        with self._lock:
+            return [self._view(job) for job in self._jobs.values()]
+
+    def _view(self, job):
+        # Public copy of a job; 'running' once a worker has picked it up
+        view = dict(job)
+        future = self._futures.get(job['id'])
+        if future is not None and future.running():
+            view['status'] = 'running'
+        view['result'] = f"/jobs/{job['id']}/result" if job['status'] == 'done' else None
+        del view['output']
+        return view
+
+    def result_path(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return (job['output'], FORMATS[job['format']][1]) if job and job['status'] == 'done' else (None, None)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+# Worker processes: one generator and catalog per process, reused across jobs
+_worker = {}
+
+def _init_worker(db_path):
+    from catalog import Catalog
+    from database import init_db
+    conn = init_db(db_path)
+    _worker.update(conn=conn, catalog=Catalog(conn), generators={})
+
+def _run_job(items, stock_name, fmt, output):
+    from cli import resolve_row
+    from generator import LabelGenerator
+    from registry import record_printed
+    from models import QueueItem
+    from stock import STOCKS
+    started = time.perf_counter()
+    conn, catalog = _worker['conn'], _worker['catalog']
+    catalog.refresh()  # Once per job rather than per lookup
+    labels = []
+    for n, row in enumerate(items, start=1):
+        try:
+            labels.append(resolve_row(row, catalog))
+        except ValueError as e:
+            raise ValueError(f"item {n}: {e}")
+    gen = _worker['generators'].get(stock_name)
+    if gen is None:
+        gen = _worker['generators'][stock_name] = LabelGenerator(conn, stock=STOCKS[stock_name])
+    queue = [QueueItem(None, strain, brand, tier) for strain, brand, tier in labels]
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    try:
+        from backends import PdfBackend, ZplBackend
+        gen.generate(tmp_path, ZplBackend() if fmt == 'zpl' else PdfBackend(), items=queue)
+        os.replace(tmp_path, output)  # Pollers only ever see a complete file
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    record_printed(conn, labels, output)
+    return round(time.perf_counter() - started, 3)
+
+class JobHandler(BaseHTTPRequestHandler):
+    """POST /jobs, GET /jobs, GET /jobs/<id> and GET /jobs/<id>/result."""
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            return self._send(404, {'error': 'not found'})
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            return self._send(413, {'error': 'request too large'})
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job, coalesced = self.server.service.submit(request)
+        except (ValueError, AttributeError) as e:
+            return self._send(400, {'error': str(e)})
+        except OverflowError as e:
+            return self._send(503, {'error': str(e)})
+        self._send(200 if coalesced else 202, dict(job, coalesced=coalesced))
+
+    def do_GET(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        service = self.server.service
+        if parts == ['jobs']:
+            return self._send(200, {'jobs': service.jobs()})
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = service.job(parts[1])
+            return self._send(200, job) if job else self._send(404, {'error': 'no such job'})
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'result':
+            path, content_type = service.result_path(parts[1])
+            if path is None:
+                return self._send(409 if service.job(parts[1]) else 404, {'error': 'no result (yet)'})
+            with open(path, 'rb') as f:
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+                self.end_headers()
+                while chunk := f.read(1 << 16):
+                    self.wfile.write(chunk)
+            return
+        self._send(404, {'error': 'not found'})
+
+    def _send(self, code, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Stations poll constantly; don't log every request
+
+def serve(host='127.0.0.1', port=SERVICE_PORT, workers=2, db_path=DB_PATH):
+    service = JobService(db_path, workers)
+    server = ThreadingHTTPServer((host, port), JobHandler)
+    server.service = service
+    print(f"Serving label jobs on http://{host}:{server.server_port}/jobs with {workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+def submit_job(url, items, stock=None, fmt='pdf', poll=0.2, timeout=600):
+    """Client side: submits a job to the service at url, waits for it and returns (job, result bytes)."""
+    request = urllib.request.Request(url.rstrip('/') + '/jobs', method='POST', headers={'Content-Type': 'application/json'},
+                                     data=json.dumps({'items': items, 'stock': stock, 'format': fmt}).encode('utf-8'))
+    try:
+        with urllib.request.urlopen(request) as response:
+            job = json.load(response)
+    except urllib.error.HTTPError as e:
+        raise ValueError(json.load(e).get('error', str(e)))
+    deadline = time.monotonic() + timeout
+    while job['status'] in ('queued', 'running'):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job['id']} still {job['status']} after {timeout}s")
+        time.sleep(poll)
+        with urllib.request.urlopen(f"{url.rstrip('/')}/jobs/{job['id']}") as response:
+            job = json.load(response)
+    if job['status'] != 'done':
+        raise ValueError(job['error'] or f"Job {job['id']} {job['status']}")
+    with urllib.request.urlopen(url.rstrip('/') + job['result']) as response:
+        return job, response.read()
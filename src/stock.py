@@ -0,0 +1,85 @@
+import json
+from reportlab.lib.pagesizes import letter, legal, A4
+from reportlab.lib.units import inch
+
+class LabelStock:
+    """A sheet of identical labels: page size, label size, grid and gutters.
+
+    Slots are numbered in reading order (left to right, then down). Each
+    pair uses two consecutive slots, the nametag first and then the pricetag,
+    so a sheet with an even number of columns prints pairs side by side.
+    With an odd number, a pair may wrap onto the next row. All positions
+    are worked out once here. Coordinates are the top-left corner of a
+    label, in points from the bottom-left of the page, as reportlab expects."""
+
+    def __init__(self, name, page_size, label_width, label_height, rows, cols,
+                 left_margin, top_margin, col_gap=0, row_gap=0, description=''):
+        self.name = name
+        self.page_size = page_size
+        self.label_width = label_width
+        self.label_height = label_height
+        self.rows = rows
+        self.cols = cols
+        self.left_margin = left_margin
+        self.top_margin = top_margin
+        self.col_gap = col_gap
+        self.row_gap = row_gap
+        self.description = description
+        page_width, page_height = page_size
+        if left_margin + cols * label_width + (cols - 1) * col_gap > page_width + 0.01:
+            raise ValueError(f"Stock '{name}': {cols} columns do not fit across the page")
+        if top_margin + rows * label_height + (rows - 1) * row_gap > page_height + 0.01:
+            raise ValueError(f"Stock '{name}': {rows} rows do not fit down the page")
+        top = page_height - top_margin
+        self.slots = [(left_margin + col * (label_width + col_gap), top - row * (label_height + row_gap))
+                      for row in range(rows) for col in range(cols)]
+        self.pairs_per_page = len(self.slots) // 2
+        if not self.pairs_per_page:
+            raise ValueError(f"Stock '{name}' needs at least two labels per sheet")
+        # (nametag slot, pricetag slot) for each pair on a page
+        self.pair_slots = [(self.slots[2 * n], self.slots[2 * n + 1]) for n in range(self.pairs_per_page)]
+
+    def __repr__(self):
+        return f"LabelStock({self.name!r}, {self.rows}x{self.cols} of {self.label_width / inch:g}x{self.label_height / inch:g} in)"
+
+# Built-in sheets. 'letter' is the original layout (one pair per row, four rows, 5% row gaps).
+STOCKS = {stock.name: stock for stock in (
+    LabelStock('letter', letter, 3.5 * inch, 2.25 * inch, rows=4, cols=2, left_margin=0.5 * inch, top_margin=0.5 * inch,
+               row_gap=0.05 * 2.25 * inch, description="Plain letter paper, 4 pairs per page (original layout)"),
+    LabelStock('legal', legal, 3.5 * inch, 2.25 * inch, rows=6, cols=2, left_margin=0.75 * inch, top_margin=0.25 * inch,
+               description="Plain legal paper, 6 pairs per page"),
+    LabelStock('a4', A4, 3.5 * inch, 2.25 * inch, rows=5, cols=2, left_margin=0.63 * inch, top_margin=0.21 * inch,
+               description="Plain A4 paper, 5 pairs per page"),
+    LabelStock('letter-compact', letter, 2.625 * inch, 1.6875 * inch, rows=6, cols=3, left_margin=0.25 * inch, top_margin=0.4375 * inch,
+               col_gap=0.0625 * inch, description="Letter paper, 75% size labels, 9 pairs per page"),
+    LabelStock('avery-5163', letter, 4 * inch, 2 * inch, rows=5, cols=2, left_margin=0.15625 * inch, top_margin=0.5 * inch,
+               col_gap=0.1875 * inch, description="Avery 5163/8163 shipping labels (2 x 4 in, 10 per sheet), 5 pairs"),
+    LabelStock('avery-5164', letter, 4 * inch, 3.3333 * inch, rows=3, cols=2, left_margin=0.15625 * inch, top_margin=0.5 * inch,
+               col_gap=0.1875 * inch, description="Avery 5164/8164 shipping labels (3 1/3 x 4 in, 6 per sheet), 3 pairs"),
+    LabelStock('avery-5160', letter, 2.625 * inch, 1 * inch, rows=10, cols=3, left_margin=0.1875 * inch, top_margin=0.5 * inch,
+               col_gap=0.125 * inch, description="Avery 5160/8160 address labels (1 x 2 5/8 in, 30 per sheet), 15 pairs"),
+)}
+DEFAULT_STOCK = 'letter'
+
+def load_stock(name_or_path):
+    """A built-in stock by name, or one defined in a JSON file.
+
+    The file gives page_width/page_height, label_width/label_height, rows,
+    cols, left_margin, top_margin and optionally col_gap/row_gap, all
+    lengths in inches, e.g.
+        {"name": "my-sheet", "page_width": 8.5, "page_height": 11,
+         "label_width": 4, "label_height": 2, "rows": 5, "cols": 2,
+         "left_margin": 0.16, "top_margin": 0.5, "col_gap": 0.19}"""
+    if name_or_path in STOCKS:
+        return STOCKS[name_or_path]
+    if not name_or_path.lower().endswith('.json'):
+        raise ValueError(f"Unknown label stock '{name_or_path}' (built in: {', '.join(STOCKS)})")
+    with open(name_or_path, encoding='utf-8') as f:
+        spec = json.load(f)
+    try:
+        return LabelStock(spec.get('name', name_or_path), (spec['page_width'] * inch, spec['page_height'] * inch),
+                          spec['label_width'] * inch, spec['label_height'] * inch, int(spec['rows']), int(spec['cols']),
+                          spec['left_margin'] * inch, spec['top_margin'] * inch,
+                          spec.get('col_gap', 0) * inch, spec.get('row_gap', 0) * inch, spec.get('description', ''))
+    except KeyError as e:
+        raise ValueError(f"{name_or_path}: missing {e.args[0]}")
@@ -0,0 +1,53 @@
+import re
+from datetime import datetime
+from models import Strain
+
+SUGGESTIONS = 8  # Type-ahead matches offered at once
+
+class StrainLibrary:
+    """Every strain that has been queued or printed, for type-ahead on the strain name.
+
+    Names are indexed by the strains_fts FTS5 table (kept in sync by
+    triggers, see database.py), so each word typed is matched as a prefix
+    of a word in the name: 'blu dr' finds 'Blue Dream'. The most used
+    strains come first. Without FTS5 in the SQLite build, names are matched
+    from their start instead."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'strains_fts'").fetchone() is not None
+
+    def search(self, text, limit=SUGGESTIONS):
+        words = re.findall(r'\w+', text)
+        if not words:
+            return []
+        # Names that start with the text come first
+        prefix = text.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        if self.fts:
+            query = ' '.join(f'"{word}"*' for word in words)
+            rows = self.conn.execute('''SELECT s.name, s.classification, s.thc, s.lineage FROM strains_fts f
+                                        JOIN strains s ON s.id = f.rowid WHERE strains_fts MATCH ?
+                                        ORDER BY s.name LIKE ? ESCAPE '\\' DESC, s.uses DESC, s.name LIMIT ?''', (query, prefix, limit))
+        else:
+            rows = self.conn.execute('''SELECT name, classification, thc, lineage FROM strains WHERE name LIKE ? ESCAPE '\\'
+                                        ORDER BY uses DESC, name LIMIT ?''', (prefix, limit))
+        return [Strain(name, classification, thc, lineage or '') for name, classification, thc, lineage in rows]
+
+    def remember(self, strains):
+        with self.conn:
+            remember_strains(self.conn, strains)
+
+def remember_strains(conn, strains):
+    """Adds strains to the library, or updates their details and use count. Caller commits."""
+    latest, uses = {}, {}
+    for strain in strains:
+        name = strain.name.strip()
+        if name:
+            key = name.lower()  # strains.name is NOCASE
+            latest[key] = (name, strain.classification, strain.thc_percent, strain.lineage or '')
+            uses[key] = uses.get(key, 0) + 1
+    now = datetime.now().isoformat(timespec='seconds')
+    conn.executemany('''INSERT INTO strains (name, classification, thc, lineage, uses, used_at) VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (name) DO UPDATE SET classification = excluded.classification, thc = excluded.thc,
+                        lineage = excluded.lineage, uses = uses + excluded.uses, used_at = excluded.used_at''',
+                     [latest[key] + (uses[key], now) for key in latest])
@@ -0,0 +1,83 @@
+from bisect import bisect_left
+
+FIT_MIN_SCALE = 0.75     # Shrink a line to this fraction of its size before wrapping it instead
+FIT_CACHE_SIZE = 50000   # Memoized fits kept before the memo is cleared
+
+class TextFitter:
+    """Fits single lines of text into a width: as is, shrunk, or wrapped onto two lines.
+
+    Glyph widths come from a table per font, filled from stringWidth once per
+    character (reportlab does not kern, so a string's width is the sum of its
+    characters'). Width is linear in font size, so the size that fits is
+    worked out directly rather than searched for. Results are memoized per
+    (text, font, size, width); the same tier and brand names come up on
+    thousands of labels."""
+
+    def __init__(self, min_scale=FIT_MIN_SCALE):
+        self.min_scale = min_scale
+        self._tables = {}  # font -> {char: width at 1pt}
+        self._fits = {}
+
+    def units(self, text, font):
+        # Width of text at 1pt
+        table = self._tables.get(font)
+        if table is None:
+            table = self._tables[font] = {chr(code): _char_width(chr(code), font) for code in range(32, 256)}
+        try:
+            return sum([table[char] for char in text])
+        except KeyError:
+            for char in text:
+                if char not in table:
+                    table[char] = _char_width(char, font)
+            return sum([table[char] for char in text])
+
+    def width(self, text, font, size):
+        return self.units(text, font) * size
+
+    def fit(self, text, font, size, max_width):
+        """(size, lines) to draw text within max_width.
+
+        Text that fits keeps its size. Otherwise it is shrunk, down to
+        min_scale of its size; past that it is split at the space that best
+        balances two lines, drawn at the largest size (up to the original)
+        at which both fit. A single long word is only ever shrunk."""
+        key = (text, font, size, max_width)
+        result = self._fits.get(key)
+        if result is None:
+            if len(self._fits) >= FIT_CACHE_SIZE:
+                self._fits.clear()
+            result = self._fits[key] = self._fit(text, font, size, max_width)
+        return result
+
+    def _fit(self, text, font, size, max_width):
+        units = self.units(text, font)
+        if units * size <= max_width:
+            return size, (text,)
+        shrunk = max_width / units
+        words = text.split(' ')
+        if shrunk >= size * self.min_scale or len(words) < 2:
+            return shrunk, (text,)
+        # Width of the first n words for every n; the best break is where that passes half the total
+        space = self.units(' ', font)
+        ends = []
+        total = -space
+        for word in words:
+            total += self.units(word, font) + space
+            ends.append(total)
+        middle = bisect_left(ends, units / 2, 0, len(words) - 1)
+        best = None
+        for n in (middle, middle + 1):
+            if 1 <= n < len(words):
+                widest = max(ends[n - 1], units - ends[n - 1] - space)
+                if best is None or widest < best[0]:
+                    best = (widest, n)
+        wrapped = min(size, max_width / best[0])
+        if wrapped <= shrunk:
+            return shrunk, (text,)
+        return wrapped, (' '.join(words[:best[1]]), ' '.join(words[best[1]:]))
+
+def _char_width(char, font):
+    from reportlab.pdfbase.pdfmetrics import stringWidth  # Loaded with the first job, not at startup
+    return stringWidth(char, font, 1)
+
+FITTER = TextFitter()  # Shared by every LabelTemplate, so fits carry across jobs and stocks
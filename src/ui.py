@@ -1,17 +1,30 @@
 import sqlite3
+import threading
 import tkinter as tk
+from queue import Queue, Empty
 from tkinter import messagebox, filedialog, ttk
-from database import init_db
-from generator import LabelGenerator
-from models import Strain, CLASSIFICATIONS
+from catalog import Catalog
+from database import init_db, set_tier_prices, delete_tier_prices, bulk_update_prices
+from generator import LabelGenerator, GenerationCancelled
+from backends import ZplBackend
+from dispatch import Dispatcher, OpenViewer, PrintToQueue, ArchiveCopy
+from metrics import JobMetrics, profiled
+from models import Strain, QueueItem, CLASSIFICATIONS, PRICE_WEIGHTS
+from preview import LabelPreview
+from queue_view import QueueView
+from registry import record_printed, reprint_batch
+from stock import STOCKS, DEFAULT_STOCK
+from strains import StrainLibrary, SUGGESTIONS
 import os
-import json  # For json.loads
+
+PREVIEW_DELAY_MS = 120  # Typing pause before the preview redraws
 
 class JarLabelerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("JarLabeler")
         self.db_conn = init_db()
+        self.catalog = Catalog(self.db_conn, watch=True)  # Call catalog_changed() after every brand/tier write here
         self.gen = LabelGenerator(self.db_conn)
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill='both', expand=True)
@@ -32,6 +45,18 @@ class JarLabelerApp:
         tk.Label(self.gen_frame, text="Strain Name").pack()
         self.name_entry = tk.Entry(self.gen_frame)
         self.name_entry.pack()
+        # Type-ahead from the strain library; picking a strain fills in the fields below
+        self.strains = StrainLibrary(self.db_conn)
+        self.suggestions = []
+        self.suggestion_list = tk.Listbox(self.gen_frame, height=SUGGESTIONS, exportselection=False)
+        self.name_entry.bind("<KeyRelease>", self.update_suggestions)
+        self.name_entry.bind("<Down>", self.focus_suggestions)
+        self.name_entry.bind("<Escape>", self.hide_suggestions)
+        self.name_entry.bind("<FocusOut>", lambda e: self.root.after(150, self._hide_unless_focused))
+        self.suggestion_list.bind("<ButtonRelease-1>", self.pick_suggestion)
+        self.suggestion_list.bind("<Return>", self.pick_suggestion)
+        self.suggestion_list.bind("<Escape>", self.hide_suggestions)
+        self.suggestion_list.bind("<FocusOut>", lambda e: self.root.after(150, self._hide_unless_focused))
         tk.Label(self.gen_frame, text="Classification").pack()
         self.class_combo = ttk.Combobox(self.gen_frame, values=CLASSIFICATIONS)
         self.class_combo.pack()
@@ -42,13 +67,57 @@ class JarLabelerApp:
         self.thc_entry = tk.Entry(self.gen_frame)
         self.thc_entry.pack()
         tk.Button(self.gen_frame, text="Add Pair to Queue", command=self.add_to_queue).pack()
+        # Live preview of the pair being entered
+        self.preview_frame = ttk.LabelFrame(self.gen_frame, text='Label Preview')
+        self.preview_frame.pack(pady=(10, 0))
+        self.preview_label = tk.Label(self.preview_frame, text="Pick a brand and tier to preview")
+        self.preview_label.pack()
+        self.preview = LabelPreview()
+        self._preview_image = None
+        self._preview_after = None
+        for entry in (self.name_entry, self.lineage_entry, self.thc_entry):
+            entry.bind("<KeyRelease>", self.schedule_preview, add='+')
+        for combo in (self.category_combo, self.brand_combo, self.tier_combo, self.class_combo):
+            combo.bind("<<ComboboxSelected>>", self.schedule_preview, add='+')
         # Queue preview section
         self.queue_frame = ttk.LabelFrame(self.gen_frame, text='Label Queue Preview')
         self.queue_frame.pack(fill='x', pady=10)
-        self.queue_list = tk.Listbox(self.queue_frame, height=5)
-        self.queue_list.pack(fill='x')
+        self.queue_view = QueueView(self.queue_frame, rows=8)
+        self.queue_view.pack(fill='both', expand=True)
         tk.Button(self.queue_frame, text="Delete Selected from Queue", command=self.delete_from_queue).pack()
-        tk.Button(self.gen_frame, text="Generate PDF from Queue", command=self.generate_pdf).pack()
+        tk.Label(self.gen_frame, text="Label Stock").pack()
+        self.stock_combo = ttk.Combobox(self.gen_frame, values=list(STOCKS), state='readonly')
+        self.stock_combo.set(DEFAULT_STOCK)
+        self.stock_combo.pack()
+        self.stock_combo.bind("<<ComboboxSelected>>", self.change_stock)
+        tk.Label(self.gen_frame, text="Thermal Printer (host:port, blank for PDF)").pack()
+        self.printer_entry = tk.Entry(self.gen_frame)
+        self.printer_entry.pack()
+        # What happens to a finished PDF; run by the dispatcher in the background (see dispatch.py)
+        self.open_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(self.gen_frame, text="Open PDF when done", variable=self.open_var).pack()
+        self.lp_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.gen_frame, text="Print PDF with lp to queue (blank for the default printer):", variable=self.lp_var).pack()
+        self.lp_entry = tk.Entry(self.gen_frame)
+        self.lp_entry.pack()
+        self.archive_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.gen_frame, text="Archive a copy", variable=self.archive_var).pack()
+        self.dispatch_events = Queue()  # (job, finished) from the dispatch thread
+        self.dispatcher = Dispatcher(on_update=lambda job: self.dispatch_events.put((job, job.finished.is_set())),
+                                     metrics_path=self.gen.metrics_path)
+        self._dispatch_polling = False
+        self.generate_button = tk.Button(self.gen_frame, text="Generate PDF from Queue", command=self.generate_pdf)
+        self.generate_button.pack()
+        tk.Button(self.gen_frame, text="Queue Reprints for Price Changes", command=lambda: self.queue_reprints(ask=False)).pack()
+        # Background job progress
+        self.progress = ttk.Progressbar(self.gen_frame, mode='determinate', length=250)
+        self.progress.pack(pady=(5, 0))
+        self.progress_label = tk.Label(self.gen_frame, text="")
+        self.progress_label.pack()
+        self.cancel_button = tk.Button(self.gen_frame, text="Cancel Generation", command=self.cancel_generation, state='disabled')
+        self.cancel_button.pack()
+        self.job_events = Queue()  # Worker thread -> Tk thread messages
+        self.cancel_event = None
         # Configuration Tab
         self.config_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.config_frame, text='Configuration')
@@ -76,21 +145,24 @@ class JarLabelerApp:
         tk.Button(self.config_frame, text="Create New Brand", command=self.open_new_brand_window).grid(row=1, column=0, columnspan=2, pady=10)
         tk.Button(self.config_frame, text="Edit Selected Brand", command=self.open_edit_brand_window).grid(row=2, column=0, columnspan=2, pady=10)
         tk.Button(self.config_frame, text="Delete Selected Brand", command=self.delete_brand).grid(row=3, column=0, columnspan=2, pady=10)
+        tk.Button(self.config_frame, text="Bulk Price Update", command=self.open_bulk_price_window).grid(row=4, column=0, columnspan=2, pady=10)
         self.selected_brand_id = None
         self.selected_tier_id = None
         self.refresh_brand_lists()
         self.refresh_queue_list()  # Initial refresh
 
+    def catalog_changed(self):
+        # The only place the in-memory catalog is dropped; the next lookup reloads it
+        self.catalog.invalidate()
+        self.schedule_preview()  # Prices or names on the previewed pair may have changed
+
     def refresh_brand_lists(self):
         self.rec_list.delete(0, tk.END)
         self.med_list.delete(0, tk.END)
-        c = self.db_conn.cursor()
-        c.execute("SELECT id, name FROM brands WHERE category='REC'")
-        for row in c.fetchall():
-            self.rec_list.insert(tk.END, row[1])
-        c.execute("SELECT id, name FROM brands WHERE category='MED'")
-        for row in c.fetchall():
-            self.med_list.insert(tk.END, row[1])
+        for brand in self.catalog.brands('REC'):
+            self.rec_list.insert(tk.END, brand['name'])
+        for brand in self.catalog.brands('MED'):
+            self.med_list.insert(tk.END, brand['name'])
         self.tiers_frame.grid_remove()
 
     def show_brand_details(self, category):
@@ -103,9 +175,7 @@ class JarLabelerApp:
         if not sel:
             return
         brand_name = listbox.get(sel[0])
-        c = self.db_conn.cursor()
-        c.execute("SELECT id FROM brands WHERE name=? AND category=?", (brand_name, category))
-        self.selected_brand_id = c.fetchone()[0]
+        self.selected_brand_id = self.catalog.brand(category, brand_name)['id']
         self.refresh_tier_list()
         self.tiers_frame.grid()  # Show the frame
         self.selected_tier_id = None
@@ -113,10 +183,8 @@ class JarLabelerApp:
     def refresh_tier_list(self):
         self.tier_list.delete(0, tk.END)
         if self.selected_brand_id:
-            c = self.db_conn.cursor()
-            c.execute("SELECT id, name FROM tiers WHERE brand_id=?", (self.selected_brand_id,))
-            for row in c.fetchall():
-                self.tier_list.insert(tk.END, row[1])
+            for tier in self.catalog.tiers(self.selected_brand_id):
+                self.tier_list.insert(tk.END, tier['name'])
 
     def open_new_brand_window(self):
         win = tk.Toplevel(self.root)
@@ -142,6 +210,7 @@ class JarLabelerApp:
                 c.execute("INSERT INTO brands (name, category, logo_path) VALUES (?, ?, ?)",
                           (name, category, logo_path[0]))
                 self.db_conn.commit()
+                self.catalog_changed()
                 self.refresh_brand_lists()
                 self.update_brands()  # Refresh main tab
                 messagebox.showinfo("Success", f"Brand {name} created.")
@@ -150,6 +219,54 @@ class JarLabelerApp:
                 messagebox.showerror("Error", "Brand name must be unique within category.")
         tk.Button(win, text="Save Brand", command=save_brand).pack()
 
+    def open_bulk_price_window(self):
+        win = tk.Toplevel(self.root)
+        win.title("Bulk Price Update")
+        # Blank filters match everything, e.g. MED / any brand / Red Tier / 3.5g
+        tk.Label(win, text="Category").pack()
+        cat_combo = ttk.Combobox(win, values=["", "REC", "MED"])
+        cat_combo.pack()
+        tk.Label(win, text="Brand").pack()
+        brand_combo = ttk.Combobox(win, values=[""] + sorted({b['name'] for b in self.catalog.brands()}))
+        brand_combo.pack()
+        tk.Label(win, text="Tier").pack()
+        tier_combo = ttk.Combobox(win, values=[""] + sorted({t['name'] for t in self.catalog.tiers()}))
+        tier_combo.pack()
+        tk.Label(win, text="Weight").pack()
+        weight_combo = ttk.Combobox(win, values=[""] + PRICE_WEIGHTS)
+        weight_combo.pack()
+        tk.Label(win, text="Add $ (negative to lower)").pack()
+        add_entry = tk.Entry(win)
+        add_entry.pack()
+        tk.Label(win, text="Change % (e.g. -20 for a 20% sale)").pack()
+        percent_entry = tk.Entry(win)
+        percent_entry.pack()
+        def apply_update():
+            try:
+                add = float(add_entry.get() or 0)
+                percent = float(percent_entry.get() or 0)
+            except ValueError:
+                messagebox.showerror("Error", "Amount and percentage must be numbers.")
+                return
+            filters = dict(category=cat_combo.get() or None, brand=brand_combo.get() or None,
+                           tier=tier_combo.get() or None, weight=weight_combo.get() or None)
+            try:
+                count = bulk_update_prices(self.db_conn, add=add, percent=percent, dry_run=True, **filters)
+                if not count:
+                    messagebox.showinfo("Bulk Price Update", "No prices match those filters.")
+                    return
+                if not messagebox.askyesno("Bulk Price Update", f"Update {count} price(s)?"):
+                    return
+                bulk_update_prices(self.db_conn, add=add, percent=percent, **filters)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.catalog_changed()
+            messagebox.showinfo("Success", f"Updated {count} price(s).")
+            win.destroy()
+            self.queue_reprints()
+        tk.Button(win, text="Apply", command=apply_update).pack()
+
     def open_add_tier_window(self):
         if not self.selected_brand_id:
             messagebox.showerror("Error", "Select a brand first.")
@@ -161,11 +278,8 @@ class JarLabelerApp:
         if not sel or not self.selected_brand_id:
             messagebox.showerror("Error", "Select a tier and brand first.")
             return
-        tier_name = self.tier_list.get(sel[0])
-        c = self.db_conn.cursor()
-        c.execute("SELECT name, prices, nametag_logo_path FROM tiers WHERE brand_id=? AND name=?", 
-                  (self.selected_brand_id, tier_name))
-        data = c.fetchone()
+        tier = self.catalog.tier(self.selected_brand_id, self.tier_list.get(sel[0]))
+        data = (tier['name'], tier['id'], tier['nametag_logo_path'], tier['prices']) if tier else None
         self._open_tier_window("Edit Tier", data)
 
     def _open_tier_window(self, title, data=None):
@@ -179,9 +293,8 @@ class JarLabelerApp:
         logo_label = tk.Label(win, text="No logo")
         logo_label.pack()
         # Pricing boxes (6 for REC/MED; 1g to 1lb)
-        price_labels = ["1g", "3.5g", "7g", "14g", "28g", "1lb"]
         prices = {}
-        for label in price_labels:
+        for label in PRICE_WEIGHTS:
             tk.Label(win, text=f"{label} Price (optional)").pack()
             entry = tk.Entry(win)
             entry.pack()
@@ -190,7 +303,7 @@ class JarLabelerApp:
             name_entry.insert(0, data[0])
             logo_path[0] = data[2]
             logo_label['text'] = data[2] or "No logo"
-            saved_prices = json.loads(data[1] or "{}")
+            saved_prices = data[3]
             for label, entry in prices.items():
                 entry.insert(0, saved_prices.get(label, ''))
         def save_tier():
@@ -199,22 +312,33 @@ class JarLabelerApp:
                 messagebox.showerror("Error", "Tier name required.")
                 return
             price_dict = {label: entry.get() or '' for label, entry in prices.items()}
-            price_json = json.dumps(price_dict)
-            print(f"DEBUG: Saving tier with name={name}, prices={price_json}, nametag_logo_path={logo_path[0]}")
             c = self.db_conn.cursor()
-            if data:  # Update existing for edit
-                print(f"DEBUG: UPDATE SQL with name={name}, prices={price_json}, nametag_logo_path={logo_path[0]}, old_name={data[0]}, brand_id={self.selected_brand_id}")
-                c.execute("UPDATE tiers SET name=?, prices=?, nametag_logo_path=? WHERE name=? AND brand_id=?", 
-                          (name, price_json, logo_path[0], data[0], self.selected_brand_id))
-            else:  # Insert new for add
-                print(f"DEBUG: INSERT SQL with brand_id={self.selected_brand_id}, name={name}, prices={price_json}, nametag_logo_path={logo_path[0]}")
-                c.execute("INSERT INTO tiers (brand_id, name, prices, nametag_logo_path) VALUES (?, ?, ?, ?)",
-                          (self.selected_brand_id, name, price_json, logo_path[0]))
+            try:
+                if data:  # Update existing for edit
+                    c.execute("UPDATE tiers SET name=?, nametag_logo_path=? WHERE id=?",
+                              (name, logo_path[0], data[1]))
+                    tier_id = data[1]
+                else:  # Insert new for add
+                    c.execute("INSERT INTO tiers (brand_id, name, nametag_logo_path) VALUES (?, ?, ?)",
+                              (self.selected_brand_id, name, logo_path[0]))
+                    tier_id = c.lastrowid
+                set_tier_prices(self.db_conn, tier_id, price_dict)
+            except sqlite3.IntegrityError:
+                self.db_conn.rollback()
+                messagebox.showerror("Error", "Tier name must be unique for this brand.")
+                return
+            except ValueError as e:
+                self.db_conn.rollback()
+                messagebox.showerror("Error", str(e))
+                return
             self.db_conn.commit()
+            self.catalog_changed()
             self.refresh_tier_list()
             self.update_tiers()  # Refresh main tab
             messagebox.showinfo("Success", f"Tier {name} {title.lower()}ed.")
             win.destroy()
+            if data:
+                self.queue_reprints([tier_id])
         tk.Button(win, text="Save Tier", command=save_tier).pack()
 
     def _upload_and_set(self, path_list, label, title):
@@ -230,10 +354,7 @@ class JarLabelerApp:
     def update_brands(self, event=None):
         category = self.category_combo.get()
         if category:
-            c = self.db_conn.cursor()
-            c.execute("SELECT name FROM brands WHERE category=?", (category,))
-            brands = [row[0] for row in c.fetchall()]
-            self.brand_combo['values'] = brands
+            self.brand_combo['values'] = [brand['name'] for brand in self.catalog.brands(category)]
             self.brand_combo.set('')
             self.tier_combo.set('')
             self.tier_combo['values'] = []
@@ -241,14 +362,9 @@ class JarLabelerApp:
     def update_tiers(self, event=None):
         brand_name = self.brand_combo.get()
         if brand_name:
-            c = self.db_conn.cursor()
-            c.execute("SELECT id FROM brands WHERE name=? AND category=?", (brand_name, self.category_combo.get()))
-            brand_id_row = c.fetchone()
-            if brand_id_row:
-                brand_id = brand_id_row[0]
-                c.execute("SELECT name FROM tiers WHERE brand_id=?", (brand_id,))
-                tiers = [row[0] for row in c.fetchall()]
-                self.tier_combo['values'] = tiers
+            brand = self.catalog.brand(self.category_combo.get(), brand_name)
+            if brand:
+                self.tier_combo['values'] = [tier['name'] for tier in self.catalog.tiers(brand['id'])]
                 self.tier_combo.set('')
             else:
                 self.tier_combo['values'] = []
@@ -263,59 +379,268 @@ class JarLabelerApp:
                 raise ValueError("All required fields must be filled.")
             thc = float(self.thc_entry.get())
             strain = Strain(self.name_entry.get(), self.class_combo.get(), thc, self.lineage_entry.get())
-            c = self.db_conn.cursor()
-            c.execute("SELECT * FROM brands WHERE name=? AND category=?", (brand_name, category))
-            brand_data = c.fetchone()
-            if brand_data:
-                brand = {'id': brand_data[0], 'name': brand_data[1], 'category': brand_data[2], 'logo_path': brand_data[3]}
-            else:
+            brand = self.catalog.brand(category, brand_name)
+            if not brand:
                 raise ValueError("Brand not found for selected category.")
-            c.execute("SELECT * FROM tiers WHERE brand_id=? AND name=?", (brand['id'], tier_name))
-            tier_data = c.fetchone()
-            if tier_data:
-                # Indices: 0=id, 1=brand_id, 2=name, 3=nametag_bg_path, 4=pricetag_bg_path, 5=prices, 6=nametag_logo_path
-                import json
-                tier = {
-                    'id': tier_data[0],
-                    'name': tier_data[2],
-                    'prices': json.loads(tier_data[5] or '{}'),
-                    'nametag_logo_path': tier_data[6]
-                }
-            else:
+            tier = self.catalog.tier(brand['id'], tier_name)
+            if not tier:
                 raise ValueError("Tier not found for selected brand.")
-            self.gen.add_to_queue(strain, brand, tier)
-            self.refresh_queue_list()
+            item = self.gen.add_to_queue(strain, brand, tier)
+            self.queue_view.add(item)
+            self.strains.remember([strain])
             messagebox.showinfo("Added", f"Pair added to queue (total: {len(self.gen.queue)})")
             # Clear inputs for next
             self.name_entry.delete(0, tk.END)
             self.lineage_entry.delete(0, tk.END)
             self.thc_entry.delete(0, tk.END)
             self.class_combo.set('')
+            self.schedule_preview()
         except ValueError as e:
             messagebox.showerror("Error", str(e))
 
+    def update_suggestions(self, event=None):
+        if event is not None and event.keysym in ('Down', 'Up', 'Escape', 'Return', 'Tab'):
+            return
+        self.suggestions = self.strains.search(self.name_entry.get())  # A few ms even with 50k strains (FTS5 prefix index)
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_list.delete(0, tk.END)
+        for strain in self.suggestions:
+            self.suggestion_list.insert(tk.END, f"{strain.name}  ({strain.classification}, {strain.thc_percent}% THC)")
+        self.suggestion_list.configure(height=len(self.suggestions))
+        self.suggestion_list.place(in_=self.name_entry, x=0, rely=1.0, relwidth=1.5)  # Over the fields below, like a dropdown
+        self.suggestion_list.lift()
+
+    def focus_suggestions(self, event=None):
+        if self.suggestions and self.suggestion_list.winfo_ismapped():
+            self.suggestion_list.focus_set()
+            self.suggestion_list.selection_clear(0, tk.END)
+            self.suggestion_list.selection_set(0)
+            self.suggestion_list.activate(0)
+
+    def pick_suggestion(self, event=None):
+        sel = self.suggestion_list.curselection()
+        if not sel:
+            return
+        strain = self.suggestions[sel[0]]
+        self.hide_suggestions()
+        self.name_entry.delete(0, tk.END)
+        self.name_entry.insert(0, strain.name)
+        self.class_combo.set(strain.classification or '')
+        self.lineage_entry.delete(0, tk.END)
+        self.lineage_entry.insert(0, strain.lineage)
+        self.thc_entry.delete(0, tk.END)
+        self.thc_entry.insert(0, f"{strain.thc_percent:g}" if strain.thc_percent is not None else '')
+        self.thc_entry.focus_set()  # THC is what changes most between batches of the same strain
+        self.schedule_preview()
+
+    def hide_suggestions(self, event=None):
+        self.suggestion_list.place_forget()
+
+    def _hide_unless_focused(self):
+        if self.root.focus_get() not in (self.name_entry, self.suggestion_list):
+            self.hide_suggestions()
+
+    def queue_reprints(self, tier_ids=None, ask=True):
+        # Queues a new label for each printed one whose tier prices changed since (see registry.py)
+        queued = {(item.strain.name, item.tier['id'], item.tier.get('price_version')) for item in self.gen.queue}
+        batch = [label for label in reprint_batch(self.db_conn, self.catalog, tier_ids)
+                 if (label[0].name, label[2]['id'], label[2]['price_version']) not in queued]
+        if not batch:
+            if not ask:
+                messagebox.showinfo("Reprints", "No printed labels show old prices.")
+            return
+        if ask and not messagebox.askyesno("Reprints", f"{len(batch)} printed label(s) now show old prices. Add them to the queue for reprinting?"):
+            return
+        for strain, brand, tier in batch:
+            self.queue_view.add(self.gen.add_to_queue(strain, brand, tier))
+        messagebox.showinfo("Reprints", f"Added {len(batch)} reprint(s) to the queue (total: {len(self.gen.queue)})")
+
+    def change_stock(self, event=None):
+        if self.cancel_event is not None:
+            self.stock_combo.set(self.gen.stock.name)  # Can't switch sheets under a running job
+            return
+        self.gen.set_stock(STOCKS[self.stock_combo.get()])
+        self.schedule_preview()
+
+    def schedule_preview(self, event=None):
+        # Debounced like the queue filter; each redraw only lays out the nametag text (see preview.py)
+        if self._preview_after is not None:
+            self.root.after_cancel(self._preview_after)
+        self._preview_after = self.root.after(PREVIEW_DELAY_MS, self.update_preview)
+
+    def update_preview(self):
+        self._preview_after = None
+        brand = self.catalog.brand(self.category_combo.get(), self.brand_combo.get())
+        tier = self.catalog.tier(brand['id'], self.tier_combo.get()) if brand else None
+        if not tier:
+            self._preview_image = None
+            self.preview_label.configure(image='', text="Pick a brand and tier to preview")
+            return
+        try:
+            thc = float(self.thc_entry.get() or 0)
+        except ValueError:
+            thc = 0.0
+        strain = Strain(self.name_entry.get() or "Strain Name", self.class_combo.get(), thc, self.lineage_entry.get())
+        from PIL import ImageTk
+        image = self.preview.render(self.gen.template, strain, brand, tier)
+        self._preview_image = ImageTk.PhotoImage(image)  # Tk doesn't keep its own reference
+        self.preview_label.configure(image=self._preview_image, text='')
+
     def refresh_queue_list(self):
-        self.queue_list.delete(0, tk.END)
-        for summary in self.gen.get_queue_summary():
-            self.queue_list.insert(tk.END, summary)
+        self.queue_view.set_items(self.gen.queue)
 
     def delete_from_queue(self):
-        sel = self.queue_list.curselection()
-        if not sel:
+        ids = self.queue_view.selected_ids()
+        if not ids:
             messagebox.showerror("Error", "Select a queue item to delete.")
             return
-        index = sel[0]
-        if messagebox.askyesno("Confirm", "Delete this queue item?"):
-            self.gen.remove_from_queue(index)
-            self.refresh_queue_list()
+        prompt = "Delete this queue item?" if len(ids) == 1 else f"Delete {len(ids)} queue items?"
+        if messagebox.askyesno("Confirm", prompt):
+            self.gen.remove_items(ids)
+            self.queue_view.remove(ids)
 
     def generate_pdf(self):
+        if self.cancel_event is not None:
+            return  # A job is already running
+        items = self.current_items(self.gen.snapshot())
+        if not items:
+            messagebox.showerror("Error", "Queue is empty. Add pairs first.")
+            return
+        # The worker only gets the snapshot; it never touches self.db_conn or Tk widgets
+        printer = self.printer_entry.get().strip() or None
+        self.cancel_event = threading.Event()
+        self.generate_button['state'] = 'disabled'
+        self.cancel_button['state'] = 'normal'
+        self.progress['value'] = 0
+        self.progress_label['text'] = f"Generating {len(items)} label pair(s)..."
+        threading.Thread(target=self._generation_worker, args=(items, self.cancel_event, printer), daemon=True).start()
+        self.root.after(50, self._poll_generation)
+
+    def current_items(self, items):
+        # Queued items keep the brand/tier dicts they were added with; a job prints the catalog's current ones
+        current = {}
+        fresh = []
+        for item in items:
+            key = (item.brand['id'], item.tier['id'])
+            pair = current.get(key)
+            if pair is None:
+                brand, tier = self.catalog.brand_by_id(key[0]), self.catalog.tier_by_id(key[1])
+                pair = current[key] = (brand, tier) if brand and tier else (item.brand, item.tier)  # Deleted since: as queued
+            fresh.append(item if pair == (item.brand, item.tier) else QueueItem(item.id, item.strain, *pair))
+        return fresh
+
+    def _generation_worker(self, items, cancel_event, printer=None):
+        profile_path = os.environ.get('JARLABELER_PROFILE')  # e.g. output/job.prof to cProfile each job
+        if profile_path:
+            with profiled(profile_path):
+                self._run_generation(items, cancel_event, printer)
+        else:
+            self._run_generation(items, cancel_event, printer)
+
+    def _run_generation(self, items, cancel_event, printer=None):
+        events = self.job_events
+        metrics = JobMetrics('zpl' if printer else 'generate')
+        progress = lambda done, total: events.put(('progress', done, total))
         try:
-            pdf_path = self.gen.generate_pdf()
+            if printer:
+                # Straight to a thermal printer as ZPL (see backends.py); nothing to open afterwards
+                self.gen.generate(printer, ZplBackend(), items=items, progress=progress, cancel=cancel_event, metrics=metrics)
+                if self.gen.metrics_path:
+                    metrics.write(self.gen.metrics_path)
+                events.put(('sent', printer, items))
+                return
+            pdf_path = self.gen.generate_pdf(items=items, progress=progress, cancel=cancel_event, metrics=metrics)
+        except GenerationCancelled:
+            events.put(('cancelled',))
+            return
+        except Exception as e:
+            events.put(('error', str(e)))
+            return
+        if self.gen.metrics_path:
+            metrics.write(self.gen.metrics_path)
+        events.put(('done', pdf_path, items, metrics.id))
+
+    def _poll_generation(self):
+        try:
+            while True:
+                event = self.job_events.get_nowait()
+                kind = event[0]
+                if kind == 'progress':
+                    _, done, total = event
+                    self.progress['maximum'] = total
+                    self.progress['value'] = done
+                    self.progress_label['text'] = f"Page {done} of {total}"
+                else:
+                    self._finish_generation(event)
+                    return
+        except Empty:
+            pass
+        self.root.after(50, self._poll_generation)
+
+    def _finish_generation(self, event):
+        self.cancel_event = None
+        self.generate_button['state'] = 'normal'
+        self.cancel_button['state'] = 'disabled'
+        kind = event[0]
+        if kind in ('done', 'sent'):
+            self.progress_label['text'] = "Done"
+            record_printed(self.db_conn, ((item.strain, item.brand, item.tier) for item in event[2]), event[1])
             self.refresh_queue_list()  # Clear preview after generation
-            messagebox.showinfo("Success", f"PDF generated at {pdf_path}")
-        except ValueError as e:
-            messagebox.showerror("Error", str(e))
+            if kind == 'sent':
+                messagebox.showinfo("Success", f"Labels sent to printer {event[1]}")
+            else:
+                self.dispatch(event[1], event[3])
+                messagebox.showinfo("Success", f"PDF generated at {event[1]}")
+        elif kind == 'cancelled':
+            self.progress['value'] = 0
+            self.progress_label['text'] = "Cancelled"
+        else:
+            self.progress_label['text'] = ""
+            messagebox.showerror("Error", event[1])
+
+    def dispatch(self, pdf_path, job_id=None):
+        # Open/print/archive the finished PDF without blocking Tk; failures are reported by _poll_dispatch.
+        # job_id is the generation job's metrics id, so the dispatch metrics can refer to it
+        steps = []
+        if self.open_var.get():
+            steps.append(OpenViewer())
+        if self.lp_var.get():
+            steps.append(PrintToQueue(self.lp_entry.get().strip() or None))
+        if self.archive_var.get():
+            steps.append(ArchiveCopy())
+        if not steps:
+            return
+        self.dispatcher.submit(pdf_path, steps, for_job=job_id)
+        if not self._dispatch_polling:
+            self._dispatch_polling = True
+            self.root.after(100, self._poll_dispatch)
+
+    def _poll_dispatch(self):
+        try:
+            while True:
+                job, finished = self.dispatch_events.get_nowait()
+                if finished:
+                    if job.errors():
+                        messagebox.showerror("Print/Open Failed", f"{job.path}\n\n" + "\n".join(job.errors()))
+                elif self.cancel_event is None:  # Don't overwrite a running job's progress
+                    active = [f"{name} (attempt {state['attempts']})" if state['attempts'] > 1 else name
+                              for name, state in job.states.items() if state['status'] in ('running', 'retrying')]
+                    self.progress_label['text'] = f"Done; {', '.join(active)}..." if active else "Done"
+        except Empty:
+            pass
+        if all(job.finished.is_set() for job in self.dispatcher.jobs) and self.dispatch_events.empty():
+            self._dispatch_polling = False
+            if self.cancel_event is None:
+                self.progress_label['text'] = "Done"
+            return
+        self.root.after(100, self._poll_dispatch)
+
+    def cancel_generation(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.progress_label['text'] = "Cancelling..."
 
     def delete_brand(self):
         # Determine which listbox has the selection
@@ -340,11 +665,14 @@ class JarLabelerApp:
         brand_id = c.fetchone()
         if brand_id:
             brand_id = brand_id[0]
-            # Delete associated tiers first
+            # Delete associated tiers (and their prices) first
+            tier_ids = [row[0] for row in c.execute("SELECT id FROM tiers WHERE brand_id=?", (brand_id,))]
+            delete_tier_prices(self.db_conn, tier_ids)
             c.execute("DELETE FROM tiers WHERE brand_id=?", (brand_id,))
             # Then delete the brand
             c.execute("DELETE FROM brands WHERE id=?", (brand_id,))
             self.db_conn.commit()
+            self.catalog_changed()
 
         # Refresh everything
         self.refresh_brand_lists()
@@ -364,8 +692,11 @@ class JarLabelerApp:
             return
 
         c = self.db_conn.cursor()
+        tier_ids = [row[0] for row in c.execute("SELECT id FROM tiers WHERE brand_id=? AND name=?", (self.selected_brand_id, tier_name))]
+        delete_tier_prices(self.db_conn, tier_ids)
         c.execute("DELETE FROM tiers WHERE brand_id=? AND name=?", (self.selected_brand_id, tier_name))
         self.db_conn.commit()
+        self.catalog_changed()
 
         # Refresh tiers list and Generate tab
         self.refresh_tier_list()
@@ -387,12 +718,11 @@ class JarLabelerApp:
             return
 
         brand_name = listbox.get(listbox.curselection()[0])
-        c = self.db_conn.cursor()
-        c.execute("SELECT id, name, category, logo_path FROM brands WHERE name=? AND category=?", (brand_name, category))
-        data = c.fetchone()
-        if not data:
+        brand = self.catalog.brand(category, brand_name)
+        if not brand:
             messagebox.showerror("Error", "Brand data not found.")
             return
+        data = (brand['id'], brand['name'], brand['category'], brand['logo_path'])
 
         win = tk.Toplevel(self.root)
         win.title("Edit Brand")
@@ -416,9 +746,10 @@ class JarLabelerApp:
                 messagebox.showerror("Error", "Category and name required.")
                 return
             try:
-                c.execute("UPDATE brands SET name=?, category=?, logo_path=? WHERE id=?",
-                          (new_name, new_category, logo_path[0], data[0]))
+                self.db_conn.execute("UPDATE brands SET name=?, category=?, logo_path=? WHERE id=?",
+                                     (new_name, new_category, logo_path[0], data[0]))
                 self.db_conn.commit()
+                self.catalog_changed()
                 self.refresh_brand_lists()
                 self.update_brands()  # Refresh main tab
                 messagebox.showinfo("Success", f"Brand {new_name} updated.")
@@ -0,0 +1,49 @@
+"""App startup against its budget (see benchmark.py --startup-only): importing the UI in a fresh interpreter.
+
+    python -m unittest discover tests
+"""
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import json
+import subprocess
+import tempfile
+import unittest
+from benchmark import STARTUP_IMPORT_BUDGET, STARTUP_RUNS, STARTUP_HEAVY_MODULES
+
+STARTUP_REPORTLAB = {'reportlab', 'reportlab.lib', 'reportlab.lib.units', 'reportlab.lib.pagesizes'}
+
+IMPORT_SCRIPT = '''
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import ui
+print(json.dumps({'seconds': time.perf_counter() - started, 'modules': sorted(sys.modules)}))
+'''
+
+class StartupTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.runs = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(STARTUP_RUNS):
+                out = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT, os.path.join(ROOT, 'src')],
+                                     cwd=tmp, capture_output=True, text=True, check=True).stdout
+                cls.runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    def test_import_within_budget(self):
+        best = min(run['seconds'] for run in self.runs)  # Best of several, as the benchmark reports it
+        self.assertLessEqual(best, STARTUP_IMPORT_BUDGET, f"importing ui took {best:.3f}s")
+
+    def test_no_rendering_modules(self):
+        modules = self.runs[0]['modules']
+        self.assertEqual([name for name in modules if name == 'PIL' or name.startswith('PIL.')], [])
+        # Only reportlab's unit and page size constants; canvas, fonts and images load with the first job
+        self.assertEqual([name for name in modules if name.startswith('reportlab') and name not in STARTUP_REPORTLAB], [])
+        self.assertEqual([name for name in STARTUP_HEAVY_MODULES if name in modules], [])
+
+if __name__ == '__main__':
+    unittest.main()
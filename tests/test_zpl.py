@@ -0,0 +1,86 @@
+"""ZplBackend against a stand-in printer: a socket that records what it is sent.
+
+    python -m unittest discover tests
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import re
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+
+class FakePrinter:
+    # Listens on a free local port and keeps everything one connection sends
+    def __init__(self):
+        self.server = socket.create_server(('127.0.0.1', 0))
+        self.address = f"127.0.0.1:{self.server.getsockname()[1]}"
+        self.received = b''
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def _accept(self):
+        conn, _ = self.server.accept()
+        with conn:
+            while chunk := conn.recv(1 << 16):
+                self.received += chunk
+        self.server.close()
+
+    def zpl(self):
+        self.thread.join(10)
+        return self.received.decode('utf-8')
+
+class ZplStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        from PIL import Image
+        from database import init_db, sync_catalog
+        from catalog import Catalog
+        from generator import LabelGenerator
+        from models import Strain
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp(prefix='jarlabeler-test-')
+        os.chdir(self.workdir)
+        Image.new('RGBA', (301, 97), 'white').save('logo.png')  # Blank, and not a multiple of 8 dots wide
+        conn = init_db(os.path.join('db', 'test.db'))
+        sync_catalog(conn, [{'category': 'REC', 'brand': 'Cherry', 'tier': tier, 'nametag_logo_path': 'logo.png',
+                             'prices': {'1g': price, '3.5g': price * 3}} for tier, price in (('Buds', 10), ('Deli', 15))])
+        catalog = Catalog(conn)
+        brand = catalog.brand('REC', 'Cherry')
+        self.gen = LabelGenerator(conn, metrics_path=None)
+        for n, tier in enumerate(['Buds', 'Deli', 'Buds', 'Buds']):
+            self.gen.add_to_queue(Strain(f"Strain {n}", 'Hybrid', 20.5, ''), brand, catalog.tier(brand['id'], tier))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir)
+
+    def send(self):
+        from backends import ZplBackend
+        printer = FakePrinter()
+        self.gen.generate(printer.address, ZplBackend())
+        return printer.zpl()
+
+    def test_repeats_are_stored_once(self):
+        zpl = self.send()
+        formats = re.findall(r'\^DFR:(\w+)\.ZPL', zpl)
+        self.assertEqual(len(formats), 2)  # One per distinct pricetag
+        self.assertEqual(re.findall(r'\^XFR:(\w+)\.ZPL', zpl), [formats[0], formats[1], formats[0], formats[0]])
+        graphics = re.findall(r'~DGR:(\w+)\.GRF', zpl)
+        self.assertEqual(len(graphics), 1)  # Both tiers share the logo
+        self.assertEqual(re.findall(r'\^XGR:(\w+)\.GRF', zpl), graphics * 4)
+        self.assertEqual(zpl.count('^XA'), 1 + 2 + 4 * 2)  # Setup, stored formats, then a nametag and pricetag per pair
+        self.assertEqual(zpl.count('^XA'), zpl.count('^XZ'))
+
+    def test_graphic_padding_is_white(self):
+        zpl = self.send()
+        total, row_bytes, data = re.search(r'~DGR:\w+\.GRF,(\d+),(\d+),([0-9A-F]+)', zpl).groups()
+        self.assertEqual(len(data), 2 * int(total))
+        self.assertEqual(int(total) % int(row_bytes), 0)
+        self.assertEqual(set(data), {'0'})  # A white logo prints nothing, including the pad bits of each row
+
+if __name__ == '__main__':
+    unittest.main()